@@ -1,15 +1,119 @@
 import os
 import logging
-from flask import Flask, render_template, request, jsonify, make_response
+import math
+import time
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from scanner import BTCOptionsScanner
-import io
-import csv
+from market import MarketDataService
+from freshness import Freshness
+from result_cache import ResultCache, ResultTokens, coerce_params
+import datatables
+import export
+import pruning
+from live_scans import LiveScanHub
 
 logging.basicConfig(level=logging.DEBUG)
 
+class SafeJSONProvider(DefaultJSONProvider):
+    """jsonify() with NaN and infinities sent as null, like the NDJSON and SSE streams"""
+    
+    def dumps(self, obj, **kwargs):
+        return super().dumps(export.json_safe(obj), **kwargs)
+
 app = Flask(__name__)
+app.json = SafeJSONProvider(app)
 app.secret_key = os.environ.get("SESSION_SECRET", "btc-options-scanner-secret-key")
 
+# Optional live chain over WebSocket; scans fall back to REST while it is down
+chain_stream = None
+if os.environ.get("DERIBIT_STREAM") == "1":
+    from market_stream import ChainSubscriber
+    chain_stream = ChainSubscriber().start()
+
+# One scanner and market-data service per process, shared by all requests
+scanner = BTCOptionsScanner(stream=chain_stream)
+market = MarketDataService(scanner, max_age=float(os.environ.get("SNAPSHOT_MAX_AGE", "5")),
+                           deadline_ms=float(os.environ["SNAPSHOT_DEADLINE_MS"])
+                           if os.environ.get("SNAPSHOT_DEADLINE_MS") else None)
+if os.environ.get("SNAPSHOT_REFRESH", "1") == "1":
+    market.start(interval=float(os.environ.get("SNAPSHOT_REFRESH_SECONDS", "5")))
+
+# Staleness each endpoint accepts by default; clients may ask for less via max_stale
+SCAN_MAX_STALE = float(os.environ.get("SCAN_MAX_STALE", "5"))
+EXPORT_MAX_STALE = float(os.environ.get("EXPORT_MAX_STALE", "60"))
+
+class InvalidParameter(ValueError):
+    """A request parameter that cannot be used; reported to the client as a 400"""
+
+def request_number(data, name, default):
+    """A non-negative number from the request, or default when it is missing or null"""
+    value = data.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise InvalidParameter(f"{name} must be a number, got {value!r}")
+    if not math.isfinite(number) or number < 0:
+        raise InvalidParameter(f"{name} must be a non-negative number, got {value!r}")
+    return number
+
+def request_prune(data):
+    """Pruning mode from the request: off (or missing), strict or likely"""
+    mode = data.get('prune')
+    if mode in (None, '', 'off'):
+        return None
+    if mode not in pruning.MODES:
+        raise InvalidParameter(f"prune must be off, {' or '.join(pruning.MODES)}, got {mode!r}")
+    return mode
+
+def request_freshness(data, default_max_stale):
+    """Freshness budget from the request's max_stale (seconds), or the endpoint default"""
+    return Freshness.max_stale(request_number(data, 'max_stale', default_max_stale))
+
+# Sorted scan results per snapshot version; identical polls are served without recomputing
+results_cache = ResultCache(max_entries=int(os.environ.get("RESULT_CACHE_ENTRIES", "256")),
+                            max_rows=int(os.environ.get("RESULT_CACHE_ROWS", "500000")))
+
+# Compress CSV exports on the fly for clients that accept gzip
+EXPORT_GZIP = os.environ.get("EXPORT_GZIP", "1") == "1"
+
+# Snapshots behind /scan responses, so /export can return exactly what was scanned
+result_tokens = ResultTokens(ttl=float(os.environ.get("RESULT_TOKEN_TTL", "600")))
+
+def scan_params(data, **overrides):
+    """Scan parameters from a request body, with defaults"""
+    params = {
+        'dte_max': data.get('dte_max'),
+        'expiry': data.get('expiry'),
+        'side': data.get('side', 'both'),
+        'delta_band': data.get('delta_band'),
+        'prem_min': data.get('prem_min'),
+        'prem_max': data.get('prem_max'),
+        'premium_in_btc': data.get('premium_in_btc', False),
+        'limit': data.get('limit', 200),
+        'sort': data.get('sort', 'pop_delta'),
+        'desc': data.get('desc', True)
+    }
+    params.update(overrides)
+    # Scan and cache keys see the same, already converted values
+    try:
+        return coerce_params(params)
+    except (TypeError, ValueError) as e:
+        raise InvalidParameter(f"Invalid scan parameter: {str(e)}")
+
+def cached_scan(snapshot, params):
+    """Scan the snapshot with params, reusing a cached result for the same version and filters"""
+    results = results_cache.get(snapshot.version, params)
+    if results is None:
+        results = scanner.scan_snapshot(snapshot, **params)
+        results_cache.put(snapshot.version, params, results)
+    return results
+
+# Registered parameter sets rescanned once per snapshot and pushed to subscribers
+live_scans = LiveScanHub(market, cached_scan, tokens=result_tokens)
+
 @app.route('/')
 def index():
     """Main page with the scanner interface"""
@@ -22,33 +126,32 @@ def scan_options():
         # Get form data
         data = request.get_json()
         
-        # Create scanner instance
-        scanner = BTCOptionsScanner()
-        
         # Parse parameters
-        params = {
-            'dte_max': data.get('dte_max'),
-            'expiry': data.get('expiry'),
-            'side': data.get('side', 'both'),
-            'delta_band': data.get('delta_band'),
-            'prem_min': data.get('prem_min'),
-            'prem_max': data.get('prem_max'),
-            'premium_in_btc': data.get('premium_in_btc', False),
-            'limit': data.get('limit', 200),
-            'sort': data.get('sort', 'pop_delta'),
-            'desc': data.get('desc', True)
-        }
-        
-        # Scan options
-        results = scanner.scan(**params)
+        params = scan_params(data)
+        
+        # Only the top `limit` rows are materialized; the token pins this snapshot so an
+        # export or table view can build the full result from it later
+        snapshot = market.get_snapshot(request_freshness(data, SCAN_MAX_STALE))
+        results = cached_scan(snapshot, params)
+        token = result_tokens.issue(snapshot, dict(params, limit=None))
         
         return jsonify({
             'success': True,
             'data': results['data'],
             'btc_spot': results['btc_spot'],
-            'total_count': results['total_count']
+            'total_count': results['total_count'],
+            'fetch_stats': results['fetch_stats'],
+            'snapshot_version': results['snapshot_version'],
+            'data_age': snapshot.age(),
+            'result_token': token
         })
         
+    except InvalidParameter as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+        
     except Exception as e:
         logging.error(f"Error in scan_options: {str(e)}")
         return jsonify({
@@ -56,49 +159,177 @@ def scan_options():
             'error': str(e)
         }), 500
 
+@app.route('/scan/table', methods=['GET', 'POST'])
+def scan_table():
+    """DataTables server-side processing: one page of a full scan result, sorted and searched"""
+    data = request.get_json(silent=True) or request.values.to_dict()
+    try:
+        try:
+            table = datatables.parse_request(data)
+        except (TypeError, ValueError) as e:
+            raise InvalidParameter(f"Invalid table request: {str(e)}")
+        # limit caps the rows the table covers; 0 or none shows all of them
+        params = scan_params(data, limit=data.get('limit'))
+        limit = params['limit']
+        
+        # Page through the result set the table was opened on while it is held
+        token = data.get('result_token')
+        results = result_tokens.resolve(token, cached_scan) if token else None
+        if results is None:
+            snapshot = market.get_snapshot(request_freshness(data, SCAN_MAX_STALE))
+            token = result_tokens.issue(snapshot, dict(params, limit=None))
+            results = result_tokens.resolve(token, cached_scan)
+        
+        rows = results['data'][:limit] if limit else results['data']
+        
+        response = datatables.query(rows, table)
+        response.update({
+            'success': True,
+            'btc_spot': results['btc_spot'],
+            'total_count': results['total_count'],
+            'snapshot_version': results['snapshot_version'],
+            'data_age': time.time() - results['fetched_at'],
+            'result_token': token
+        })
+        return jsonify(response)
+        
+    except InvalidParameter as e:
+        return jsonify({
+            'success': False,
+            'draw': data.get('draw'),
+            'error': str(e)
+        }), 400
+        
+    except Exception as e:
+        logging.error(f"Error in scan_table: {str(e)}")
+        return jsonify({
+            'success': False,
+            'draw': data.get('draw'),
+            'error': str(e)
+        }), 500
+
+@app.route('/scan/progressive', methods=['POST'])
+def scan_progressive():
+    """Stream a live scan as NDJSON: row frames as tickers arrive, then the sorted, limited result"""
+    try:
+        data = request.get_json()
+        params = scan_params(data, max_stale=request_number(data, 'max_stale', SCAN_MAX_STALE),
+                             deadline_ms=request_number(data, 'deadline_ms', None), prune=request_prune(data))
+        
+    except InvalidParameter as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+        
+    except Exception as e:
+        logging.error(f"Error in scan_progressive: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+    
+    def frames():
+        try:
+            yield from scanner.iter_scan(**params)
+        except Exception as e:
+            # Headers are already sent, so report failures in-band
+            logging.error(f"Error in scan_progressive: {str(e)}")
+            yield {'type': 'error', 'success': False, 'error': str(e)}
+    
+    response = Response(stream_with_context(export.ndjson_lines(frames())), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/scan/stream', methods=['POST'])
+def register_stream():
+    """Register a parameter set for live updates and return its feed"""
+    try:
+        feed_id = live_scans.register(scan_params(request.get_json()))
+        return jsonify({
+            'success': True,
+            'feed_id': feed_id,
+            'stream_url': f'/scan/stream/{feed_id}'
+        })
+        
+    except InvalidParameter as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+        
+    except Exception as e:
+        logging.error(f"Error in register_stream: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/scan/stream/<feed_id>')
+def scan_stream(feed_id):
+    """Server-Sent Events: the feed's current rows, then inserted/changed/removed rows per refresh"""
+    try:
+        events = live_scans.subscribe(feed_id)
+    except KeyError:
+        return jsonify({
+            'success': False,
+            'error': 'Unknown or expired feed, please register again'
+        }), 404
+    response = Response(stream_with_context(events), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/export', methods=['POST'])
 def export_csv():
-    """Export scan results to CSV"""
+    """Export scan results as CSV, or as Parquet / Arrow with ?format=parquet|arrow"""
     try:
         data = request.get_json()
-        
-        # Create scanner instance
-        scanner = BTCOptionsScanner()
+        fmt = request.args.get('format') or data.get('format') or 'csv'
+        try:
+            export.check_format(fmt)
+        except ValueError as e:
+            raise InvalidParameter(str(e))
         
         # Parse parameters (same as scan)
-        params = {
-            'dte_max': data.get('dte_max'),
-            'expiry': data.get('expiry'),
-            'side': data.get('side', 'both'),
-            'delta_band': data.get('delta_band'),
-            'prem_min': data.get('prem_min'),
-            'prem_max': data.get('prem_max'),
-            'premium_in_btc': data.get('premium_in_btc', False),
-            'limit': None,  # Export all results
-            'sort': data.get('sort', 'pop_delta'),
-            'desc': data.get('desc', True)
-        }
-        
-        # Get all results
-        results = scanner.scan(**params)
-        
-        # Create CSV
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=[
+        params = scan_params(data, limit=None)  # Export all results
+        
+        # Export the exact result set of an earlier scan when given its token
+        token = data.get('result_token')
+        if token:
+            results = result_tokens.resolve(token, cached_scan)
+            if results is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Scan results have expired, please run the scan again'
+                }), 410
+        else:
+            snapshot = market.get_snapshot(request_freshness(data, EXPORT_MAX_STALE))
+            results = cached_scan(snapshot, params)
+        
+        # Stream the file in chunks rather than building it in memory
+        chunks = export.export_chunks(fmt, results['data'], fieldnames=[
             'instrument', 'type', 'expiry', 'dte', 'spot', 'strike', 
             'iv', 'delta', 'premium_native', 'premium_usd', 
             'breakeven', 'pop_delta', 'pop_logN'
         ])
-        writer.writeheader()
-        writer.writerows(results['data'])
-        
-        # Create response
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['Content-Disposition'] = 'attachment; filename=btc_options_scan.csv'
+        response = Response(chunks, mimetype=export.CONTENT_TYPES[fmt])
+        # Parquet and Arrow are compressed internally already
+        if fmt == 'csv' and EXPORT_GZIP and request.accept_encodings['gzip']:
+            response.response = export.gzip_chunks(chunks)
+            response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Content-Disposition'] = f'attachment; filename=btc_options_scan.{export.EXTENSIONS[fmt]}'
         
         return response
         
+    except InvalidParameter as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+        
     except Exception as e:
         logging.error(f"Error in export_csv: {str(e)}")
         return jsonify({
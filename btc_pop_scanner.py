@@ -15,75 +15,14 @@ Examples:
 """
 
 import argparse
-import datetime as dt
-import math
 import sys
-from typing import Dict, Any, List, Tuple
 
-import requests
 import pandas as pd
 
-DERIBIT = "https://www.deribit.com/api/v2"
-
-
-def phi(x: float) -> float:
-    return 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
-
-
-def lognormal_pop_threshold(S0: float, sigma: float, T_years: float, threshold: float, direction: str) -> float:
-    if S0 <= 0 or sigma <= 0 or T_years <= 0 or threshold <= 0:
-        return float('nan')
-    z = (math.log(threshold / S0) + 0.5 * sigma * sigma * T_years) / (sigma * math.sqrt(T_years))
-    p_le = phi(z)
-    return p_le if direction == 'le' else (1.0 - p_le)
-
-
-def parse_instrument(instr: str) -> Tuple[dt.date, float, str]:
-    try:
-        parts = instr.split("-")
-        d = parts[1]
-        strike = float(parts[2])
-        opt_type = parts[3].upper()
-        expiry = dt.datetime.strptime(d, "%d%b%y").date()
-        return expiry, strike, opt_type
-    except Exception:
-        return None, None, None
-
-
-def get_btc_spot() -> float:
-    r = requests.get(f"{DERIBIT}/public/ticker", params={"instrument_name": "BTC-PERPETUAL"}, timeout=15)
-    r.raise_for_status()
-    data = r.json().get("result", {})
-    for key in ("index_price", "mark_price", "last_price"):
-        if key in data and data[key]:
-            return float(data[key])
-    return float(data.get("last_price", "nan"))
-
-
-def get_instruments() -> List[Dict[str, Any]]:
-    r = requests.get(f"{DERIBIT}/public/get_instruments",
-                     params={"currency": "BTC", "kind": "option", "expired": "false"},
-                     timeout=30)
-    r.raise_for_status()
-    return r.json()["result"]
-
-
-def get_ticker(instr: str) -> Dict[str, Any]:
-    r = requests.get(f"{DERIBIT}/public/ticker", params={"instrument_name": instr}, timeout=15)
-    r.raise_for_status()
-    return r.json()["result"]
-
-
-def estimate_mid(result: Dict[str, Any]) -> float:
-    bid = result.get("best_bid")
-    ask = result.get("best_ask")
-    mark = result.get("mark_price")
-    if bid is not None and ask is not None and bid > 0 and ask > 0:
-        return 0.5 * (bid + ask)
-    if mark is not None and mark > 0:
-        return float(mark)
-    last = result.get("last_price")
-    return float(last) if last is not None else float("nan")
+import columnar
+import export
+import pruning
+from scanner import BTCOptionsScanner
 
 
 def main():
@@ -103,122 +42,46 @@ def main():
                     choices=["pop_delta","pop_logN","iv","dte","strike","premium_usd","premium_native","breakeven"],
                     help="Sort by column")
     ap.add_argument("--desc", action="store_true", help="Sort descending")
-    ap.add_argument("--export", type=str, help="Export CSV filename")
+    ap.add_argument("--export", type=str, help="Export filename")
+    ap.add_argument("--export-format", choices=list(export.FORMATS), default=None,
+                    help="Export file format (default: from the --export extension, else csv); "
+                         "parquet and arrow need pyarrow")
+    ap.add_argument("--workers", type=int, default=16, help="Max concurrent ticker requests")
+    ap.add_argument("--prune", choices=["off", *pruning.MODES], default="off",
+                    help="Skip ticker calls for options whose estimated delta/premium cannot pass the filters "
+                         "(strict never drops a passing option within pruning.IV_BOUNDS or near expiry)")
     args = ap.parse_args()
-
-    today = dt.date.today()
-
-    try:
-        S0 = get_btc_spot()
-    except Exception as e:
-        print(f"Error fetching BTC spot: {e}", file=sys.stderr)
-        sys.exit(2)
-
+    if args.export:
+        # Fail before any upstream calls if the format cannot be written
+        try:
+            export.check_format(export.format_for_path(args.export, args.export_format))
+        except ValueError as e:
+            ap.error(str(e))
+
+    # Premiums are converted to USD (via spot) before filtering when --premium-in-btc is set,
+    # and breakevens always use the USD premium, like strike and spot.
+    # The export needs every row sorted; printing alone only needs the top --limit
+    scanner = BTCOptionsScanner(max_workers=args.workers)
     try:
-        instruments = get_instruments()
+        result = scanner.scan(dte_max=args.dte_max, expiry=args.expiry, side=args.side,
+                              delta_band=args.delta_band, prem_min=args.prem_min, prem_max=args.prem_max,
+                              premium_in_btc=args.premium_in_btc, limit=None if args.export else args.limit,
+                              sort=args.sort, desc=args.desc, prune=None if args.prune == "off" else args.prune)
     except Exception as e:
-        print(f"Error fetching instruments: {e}", file=sys.stderr)
+        print(str(e), file=sys.stderr)
         sys.exit(2)
 
-    rows = []
-    for ins in instruments:
-        name = ins.get("instrument_name")
-        expiry, strike, opt_type = parse_instrument(name)
-        if not expiry:
-            continue
-
-        if args.expiry:
-            try:
-                wanted = dt.datetime.strptime(args.expiry, "%Y-%m-%d").date()
-                if expiry != wanted:
-                    continue
-            except Exception:
-                print("Invalid --expiry format, expected YYYY-MM-DD", file=sys.stderr)
-                sys.exit(2)
-        elif args.dte_max is not None:
-            dte = (expiry - today).days
-            if dte < 0 or dte > args.dte_max:
-                continue
-
-        if args.side == "calls" and opt_type != "C":
-            continue
-        if args.side == "puts" and opt_type != "P":
-            continue
+    counts = result["fetch_stats"]
+    if counts["dropped"] or counts["rate_limited"] or counts["pruned"] or counts["bulk_failed"]:
+        print(f"Upstream: {counts['requests']} calls, {counts['throttled']} throttled, "
+              f"{counts['rate_limited']} rate limited, {counts['dropped']} tickers dropped, "
+              f"{counts['pruned']} pruned, {counts['bulk_failed']} bulk summary failures", file=sys.stderr)
 
-        try:
-            t = get_ticker(name)
-        except Exception:
-            continue
-
-        delta = t.get("greeks", {}).get("delta")
-        mark_iv = t.get("mark_iv")
-        premium_native = estimate_mid(t)  # as fetched (native units, usually USD on Deribit)
-
-        # Convert premium to USD if user indicates native is BTC
-        if args.premium_in_btc:
-            premium_usd = premium_native * S0 if premium_native == premium_native else float('nan')
-        else:
-            premium_usd = premium_native  # assume already USD
-
-        # Apply USD filter
-        if args.prem_min is not None and (premium_usd != premium_usd or premium_usd < args.prem_min):
-            continue
-        if args.prem_max is not None and (premium_usd != premium_usd or premium_usd > args.prem_max):
-            continue
-
-        dte = max((expiry - today).days, 0)
-        T_years = max(dte / 365.0, 1e-6)
-
-        if args.delta_band:
-            dmin, dmax = args.delta_band
-            if delta is None:
-                continue
-            if abs(delta) < dmin or abs(delta) > dmax:
-                continue
-
-        pop_delta = float('nan')
-        pop_logN = float('nan')
-        breakeven = float('nan')
-        sigma = None
-
-        if mark_iv is not None and mark_iv > 0:
-            sigma = float(mark_iv)
-
-        if delta is not None:
-            pop_delta = 1.0 - abs(float(delta))
-
-        # Breakeven must use the same currency as strike/spot: USD.
-        # If premium_native is BTC, we use premium_usd for breakeven math.
-        if sigma and premium_usd and premium_usd > 0 and S0 and S0 > 0:
-            if opt_type == "C":
-                breakeven = strike + premium_usd
-                pop_logN = lognormal_pop_threshold(S0, sigma, T_years, breakeven, direction="le")
-            else:
-                breakeven = max(strike - premium_usd, 1e-6)
-                pop_logN = lognormal_pop_threshold(S0, sigma, T_years, breakeven, direction="ge")
-
-        rows.append({
-            "instrument": name,
-            "type": "C" if opt_type == "C" else "P",
-            "expiry": expiry.isoformat(),
-            "dte": dte,
-            "spot": S0,
-            "strike": strike,
-            "iv": sigma if sigma is not None else float('nan'),
-            "delta": float(delta) if delta is not None else float('nan'),
-            "premium_native": float(premium_native) if premium_native is not None else float('nan'),
-            "premium_usd": float(premium_usd) if premium_usd == premium_usd else float('nan'),
-            "breakeven": float(breakeven) if breakeven == breakeven else float('nan'),
-            "pop_delta": float(pop_delta) if pop_delta == pop_delta else float('nan'),
-            "pop_logN": float(pop_logN) if pop_logN == pop_logN else float('nan'),
-        })
-
-    if not rows:
+    if not result["data"]:
         print("No options found with the given filters.")
         sys.exit(0)
 
-    df = pd.DataFrame(rows)
-    df = df.sort_values(by=args.sort, ascending=not args.desc, na_position="last")
+    df = pd.DataFrame(result["data"], columns=columnar.COLUMNS)
     if args.limit:
         df_print = df.head(args.limit).copy()
     else:
@@ -237,9 +100,13 @@ def main():
                              }))
 
     if args.export:
-        df.to_csv(args.export, index=False)
+        export_format = export.format_for_path(args.export, args.export_format)
+        export.write_dataframe(df, args.export, export_format)
         print(f"\nSaved full scan to {args.export}")
-        print("Tip: Load in Excel/Sheets and filter by POP, DTE, IV, etc.")
+        if export_format == "csv":
+            print("Tip: Load in Excel/Sheets and filter by POP, DTE, IV, etc.")
+        else:
+            print(f"Tip: Load with pandas.read_{'parquet' if export_format == 'parquet' else 'feather'}() for typed columns")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,108 @@
+"""
+Columnar helpers for the scan pipeline.
+
+A scan keeps its data as NumPy columns from the ticker fetch to the final
+sort, applies filters as boolean masks and only builds row dicts for the rows
+it actually returns.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+COLUMNS = [
+    "instrument", "type", "expiry", "dte", "spot", "strike",
+    "iv", "delta", "premium_native", "premium_usd",
+    "breakeven", "pop_delta", "pop_logN",
+]
+INT_COLUMNS = {"dte"}
+STR_COLUMNS = {"instrument", "type", "expiry"}
+
+
+def _field(tickers: Sequence[Optional[Dict[str, Any]]], key: str) -> np.ndarray:
+    out = np.full(len(tickers), np.nan)
+    for k, t in enumerate(tickers):
+        if t is not None:
+            v = t.get(key)
+            if v is not None:
+                out[k] = v
+    return out
+
+
+def ticker_columns(tickers: Sequence[Optional[Dict[str, Any]]]) -> Dict[str, np.ndarray]:
+    """
+    Quote fields of a list of tickers as float columns; missing values are NaN.
+
+    The boolean "present" column marks which entries had a ticker at all.
+    """
+    delta = np.full(len(tickers), np.nan)
+    for k, t in enumerate(tickers):
+        if t is not None:
+            v = (t.get("greeks") or {}).get("delta")
+            if v is not None:
+                delta[k] = v
+    return {
+        "present": np.array([t is not None for t in tickers], dtype=bool),
+        "best_bid": _field(tickers, "best_bid"),
+        "best_ask": _field(tickers, "best_ask"),
+        "mark_price": _field(tickers, "mark_price"),
+        "last_price": _field(tickers, "last_price"),
+        "mark_iv": _field(tickers, "mark_iv"),
+        "delta": delta,
+    }
+
+
+def estimate_mid(bid: np.ndarray, ask: np.ndarray, mark: np.ndarray, last: np.ndarray) -> np.ndarray:
+    """Bid/ask mid where both sides are positive, else a positive mark, else last"""
+    with np.errstate(invalid="ignore"):
+        return np.where((bid > 0) & (ask > 0), 0.5 * (bid + ask), np.where(mark > 0, mark, last))
+
+
+def sort_order(values: np.ndarray, desc: bool) -> np.ndarray:
+    """Stable sort order with NaN last in both directions (na_position="last")"""
+    if values.dtype.kind != "f":
+        # Rank non-numeric columns so descending order can negate them too
+        _, values = np.unique(values, return_inverse=True)
+    return np.argsort(-values if desc else values, kind="stable")
+
+
+def top_k_order(values: np.ndarray, k: Optional[int], desc: bool) -> np.ndarray:
+    """
+    The first k positions of sort_order(values, desc), without a full sort.
+
+    Uses a partial selection to find the k-th key, then fully sorts only the
+    selected rows. Ties at the cut-off are resolved in original order, so the
+    result is exactly the head of the stable full sort.
+    """
+    if not k or k >= len(values):
+        return sort_order(values, desc)
+    if values.dtype.kind != "f":
+        _, values = np.unique(values, return_inverse=True)
+    key = (-values if desc else values).astype(np.float64)
+
+    nan = np.isnan(key)
+    valid = np.flatnonzero(~nan)
+    if k >= len(valid):
+        head = valid[np.argsort(key[valid], kind="stable")]
+        return np.concatenate([head, np.flatnonzero(nan)[:k - len(valid)]])
+
+    valid_keys = key[valid]
+    kth = np.partition(valid_keys, k - 1)[k - 1]
+    below = valid[valid_keys < kth]
+    ties = valid[valid_keys == kth][:k - len(below)]
+    picked = np.concatenate([below, ties])
+    return picked[np.lexsort((picked, key[picked]))]
+
+
+def materialize(columns: Dict[str, np.ndarray], rows: np.ndarray) -> List[Dict[str, Any]]:
+    """Build JSON-ready row dicts for the given row positions only"""
+    picked = {}
+    for name in COLUMNS:
+        col = columns[name][rows]
+        if name in INT_COLUMNS:
+            picked[name] = [int(v) for v in col]
+        elif name in STR_COLUMNS:
+            picked[name] = [str(v) for v in col]
+        else:
+            picked[name] = col.astype(np.float64).tolist()
+    return [dict(zip(COLUMNS, values)) for values in zip(*(picked[name] for name in COLUMNS))]
@@ -0,0 +1,119 @@
+"""
+Server-side processing for DataTables (https://datatables.net/manual/server-side).
+
+The results table pages, sorts and searches on the server against a cached
+full scan result, and the browser only receives the rows it displays.
+Requests may arrive as DataTables' flat form/query parameters
+(order[0][column]=3) or as the same structure nested in a JSON body.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import columnar
+
+_KEY = re.compile(r"\[([^\]]*)\]")
+
+
+def _unflatten(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn bracketed keys such as columns[0][search][value] into nested dicts"""
+    nested: Dict[str, Any] = {}
+    for key, value in values.items():
+        head = key.split("[", 1)[0]
+        parts = [head] + _KEY.findall(key[len(head):])
+        node = nested
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+    return nested
+
+
+def _items(value) -> List[Any]:
+    """A DataTables list, sent either as a JSON list or as a dict keyed by index"""
+    if isinstance(value, dict):
+        return [value[k] for k in sorted(value, key=lambda k: int(k) if str(k).isdigit() else 0)]
+    return list(value or [])
+
+
+def parse_request(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Draw counter, paging window, ordering and search terms of a server-side request"""
+    values = _unflatten(values) if any("[" in k for k in values) else values
+    columns = []
+    column_search = {}
+    for i, col in enumerate(_items(values.get("columns"))):
+        name = str(col.get("data", "")) if isinstance(col, dict) else ""
+        if name not in columnar.COLUMNS:
+            name = columnar.COLUMNS[i] if i < len(columnar.COLUMNS) else name
+        columns.append(name)
+        term = ((col.get("search") or {}).get("value") or "") if isinstance(col, dict) else ""
+        if term and name in columnar.COLUMNS:
+            column_search[name] = str(term)
+
+    order: List[Tuple[str, bool]] = []
+    for entry in _items(values.get("order")):
+        try:
+            idx = int(entry.get("column"))
+        except (TypeError, ValueError, AttributeError):
+            continue
+        name = columns[idx] if idx < len(columns) else (columnar.COLUMNS[idx] if idx < len(columnar.COLUMNS) else None)
+        if name in columnar.COLUMNS:
+            order.append((name, str(entry.get("dir", "asc")).lower() == "desc"))
+
+    search = values.get("search") or {}
+    return {
+        "draw": int(values.get("draw") or 0),
+        "start": max(0, int(values.get("start") or 0)),
+        "length": int(values.get("length") if values.get("length") not in (None, "") else -1),
+        "search": str(search.get("value") or "") if isinstance(search, dict) else str(search),
+        "column_search": column_search,
+        "order": order,
+    }
+
+
+def _text(rows: List[Dict[str, Any]], name: str) -> np.ndarray:
+    return np.array([str(row.get(name, "")).lower() for row in rows], dtype=object)
+
+
+def _matches(text: np.ndarray, term: str) -> np.ndarray:
+    # Smart search like DataTables: every whitespace-separated word must appear
+    keep = np.ones(len(text), dtype=bool)
+    for word in term.lower().split():
+        keep &= np.fromiter((word in t for t in text), dtype=bool, count=len(text))
+    return keep
+
+
+def query(rows: List[Dict[str, Any]], request: Dict[str, Any],
+          searchable: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Answer a parsed request from rows, the full result in its scan order.
+
+    Global search matches against the searchable columns (instrument, type
+    and expiry by default); per-column search against that column. With no
+    ordering requested, rows keep their scan order.
+    """
+    searchable = searchable or ["instrument", "type", "expiry"]
+    keep = np.ones(len(rows), dtype=bool)
+    if request["search"]:
+        text = _text(rows, searchable[0])
+        for name in searchable[1:]:
+            text = text + " " + _text(rows, name)
+        keep &= _matches(text, request["search"])
+    for name, term in request["column_search"].items():
+        keep &= _matches(_text(rows, name), term)
+    positions = np.flatnonzero(keep)
+
+    # Apply the sort keys from last to first so the first one dominates
+    for name, desc in reversed(request["order"]):
+        values = np.array([rows[i][name] for i in positions])
+        positions = positions[columnar.sort_order(values, desc)]
+
+    start, length = request["start"], request["length"]
+    page = positions[start:] if length < 0 else positions[start:start + length]
+    return {
+        "draw": request["draw"],
+        "recordsTotal": len(rows),
+        "recordsFiltered": len(positions),
+        "data": [rows[i] for i in page],
+    }
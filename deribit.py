@@ -0,0 +1,244 @@
+"""
+Shared transport for Deribit public API calls.
+
+One pooled requests.Session per process, so scanner.py and btc_pop_scanner.py
+reuse keep-alive connections instead of paying a TCP+TLS handshake per call.
+429 and 5xx responses and connection errors are retried with jittered
+exponential backoff. Every attempt, retries included, first draws credits
+from a process-wide CreditLimiter, and a 429 empties the bucket before the
+next attempt. Identical calls made concurrently without a deadline are
+coalesced into a single upstream request.
+"""
+
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Hashable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from singleflight import SingleFlight
+
+DERIBIT = "https://www.deribit.com/api/v2"
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRIES = 3
+BACKOFF = 0.25
+DEFAULT_POOL_SIZE = 16
+
+# Deribit's default non-matching-engine budget: each call costs 500 credits,
+# the bucket holds 50000 and refills at 10000 per second (20 calls/s sustained)
+CREDIT_CAPACITY = 50000
+CREDIT_REFILL_PER_SEC = 10000
+CREDIT_COST = 500
+
+_session: Optional[requests.Session] = None
+_pool_size = 0
+_lock = threading.Lock()
+
+
+class CallStats:
+    """Thread-safe counters describing the upstream calls made for one scan"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.rate_limited = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.pruned = 0
+        self.bulk_failed = 0
+
+    def add(self, requests: int = 0, throttled: int = 0, rate_limited: int = 0, dropped: int = 0,
+            coalesced: int = 0, pruned: int = 0, bulk_failed: int = 0):
+        with self._lock:
+            self.requests += requests
+            self.throttled += throttled
+            self.rate_limited += rate_limited
+            self.dropped += dropped
+            self.coalesced += coalesced
+            self.pruned += pruned
+            self.bulk_failed += bulk_failed
+
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "rate_limited": self.rate_limited,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                "pruned": self.pruned,
+                "bulk_failed": self.bulk_failed,
+            }
+
+
+class CreditLimiter:
+    """
+    Token bucket modelling Deribit's credit-based rate limit.
+
+    Waiting callers are queued per owner (typically one owner per scan) and
+    owners are served round-robin, so one large scan cannot starve a
+    concurrent one.
+    """
+
+    def __init__(self, capacity: float = CREDIT_CAPACITY, refill_per_sec: float = CREDIT_REFILL_PER_SEC,
+                 cost: float = CREDIT_COST):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.cost = cost
+        self._credits = float(capacity)
+        self._stamp = time.monotonic()
+        self._queues: "OrderedDict[Hashable, deque]" = OrderedDict()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._credits = min(self.capacity, self._credits + (now - self._stamp) * self.refill_per_sec)
+        self._stamp = now
+
+    def _head(self):
+        owner = next(iter(self._queues))
+        return owner, self._queues[owner][0]
+
+    def acquire(self, owner: Hashable = None, cost: Optional[float] = None) -> float:
+        """Block until cost credits are granted to this caller; return seconds waited"""
+        cost = self.cost if cost is None else cost
+        start = time.monotonic()
+        ticket = object()
+        with self._cond:
+            self._queues.setdefault(owner, deque()).append(ticket)
+            while True:
+                self._refill()
+                head_owner, head_ticket = self._head()
+                if head_ticket is ticket:
+                    if self._credits >= cost:
+                        self._credits -= cost
+                        queue = self._queues.pop(owner)
+                        queue.popleft()
+                        if queue:
+                            # Re-queue behind the other owners
+                            self._queues[owner] = queue
+                        self._cond.notify_all()
+                        return time.monotonic() - start
+                    self._cond.wait((cost - self._credits) / self.refill_per_sec)
+                else:
+                    self._cond.wait()
+
+    def penalize(self):
+        """Empty the bucket after the exchange reported a rate-limit hit"""
+        with self._cond:
+            self._refill()
+            self._credits = 0.0
+            self._cond.notify_all()
+
+
+limiter = CreditLimiter()
+_flight = SingleFlight()
+
+
+def create_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """
+    Build a session whose connection pool holds pool_size keep-alive connections.
+
+    The adapter itself never retries; _get() does, so that every attempt
+    goes through the limiter.
+    """
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """
+    Return the process-wide session.
+
+    The pool is grown (never shrunk) so it is at least pool_size connections,
+    which should match the largest fetch concurrency in use.
+    """
+    global _session, _pool_size
+    with _lock:
+        if _session is None or pool_size > _pool_size:
+            # The old session may still have calls in flight, so it is left
+            # to be garbage collected rather than closed here
+            _pool_size = max(pool_size, _pool_size)
+            _session = create_session(_pool_size)
+        return _session
+
+
+def remaining(deadline: Optional[float], cap: float) -> float:
+    """Seconds left before deadline (epoch seconds), capped at cap and floored at 0.1"""
+    if deadline is None:
+        return cap
+    return min(cap, max(deadline - time.time(), 0.1))
+
+
+def public_get(method: str, params: Optional[Dict[str, Any]] = None, timeout: float = 15,
+               stats: Optional[CallStats] = None, deadline: Optional[float] = None) -> Any:
+    """
+    Call a public Deribit endpoint and return its result payload.
+
+    Concurrent calls with the same method and params share one request and
+    its (read-only) result. When stats is given it also identifies the
+    caller to the limiter, and records whether the call was throttled
+    locally, rate limited upstream or served by another caller's request.
+    timeout applies to each attempt; a deadline (epoch seconds) bounds the
+    whole call, retries and backoff included.
+
+    Calls with a deadline are never coalesced: they would otherwise wait
+    past their own deadline behind a slower shared call, or hand a timeout
+    caused by their deadline to callers that set none.
+    """
+    if deadline is not None:
+        return _get(method, params, timeout, stats, deadline)
+    key = (method, tuple(sorted((params or {}).items())))
+    result, shared = _flight.do(key, lambda: _get(method, params, timeout, stats))
+    if shared and stats is not None:
+        stats.add(coalesced=1)
+    return result
+
+
+def _backoff(attempt: int, response: Optional[requests.Response]) -> float:
+    """Seconds to wait before the retry after attempt: Retry-After if sent, else jittered exponential"""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    return BACKOFF * (2 ** attempt) + random.uniform(0, BACKOFF)
+
+
+def _get(method: str, params: Optional[Dict[str, Any]], timeout: float, stats: Optional[CallStats],
+         deadline: Optional[float] = None) -> Any:
+    url = f"{DERIBIT}/{method}"
+    for attempt in range(RETRIES + 1):
+        # Every attempt costs credits upstream, so every attempt draws them here
+        waited = limiter.acquire(owner=stats)
+        r, error = None, None
+        try:
+            r = get_session().get(url, params=params, timeout=remaining(deadline, timeout))
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        rate_limited = r is not None and r.status_code == 429
+        if rate_limited:
+            # The next attempt, and everyone else's, waits for the bucket to refill
+            limiter.penalize()
+        if stats is not None:
+            stats.add(requests=1, throttled=1 if waited > 0.001 else 0, rate_limited=int(rate_limited))
+        if attempt == RETRIES or (r is not None and r.status_code not in RETRY_STATUSES):
+            break
+        delay = _backoff(attempt, r)
+        if deadline is not None and time.time() + delay >= deadline:
+            # No time left for another attempt
+            break
+        time.sleep(delay)
+    if error is not None:
+        raise error
+    r.raise_for_status()
+    return r.json()["result"]
@@ -0,0 +1,206 @@
+"""
+Streaming serializers for scan exports.
+
+Exports are produced as generators of byte chunks, so a response can start
+sending before the whole file exists and memory stays bounded by the chunk
+size rather than the export size.
+
+Besides CSV, results can be written as Parquet or Arrow IPC files with typed
+columns (date expiry, integer DTE, float metrics). These need pyarrow, which
+is in requirements.txt; an install without it still exports CSV.
+"""
+
+import csv
+import datetime as dt
+import io
+import json
+import math
+import os
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+FORMATS = ("csv", "parquet", "arrow")
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+EXTENSIONS = {"csv": "csv", "parquet": "parquet", "arrow": "arrow"}
+# Both columnar formats support zstd, which decodes fast in notebooks
+COMPRESSION = "zstd"
+
+
+def csv_chunks(rows: Iterable[Dict[str, Any]], fieldnames: List[str],
+               chunk_rows: int = 1000) -> Iterator[bytes]:
+    """UTF-8 CSV (header first) in chunks of up to chunk_rows rows"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def json_safe(value):
+    """value with NaN and infinities replaced by None, since JSON.parse in browsers rejects them"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(v) for v in value]
+    return value
+
+
+def ndjson_lines(frames: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Newline-delimited JSON, one line per frame, with non-finite floats as null"""
+    for frame in frames:
+        yield (json.dumps(json_safe(frame), separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Gzip-compress a stream of chunks on the fly"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def check_format(fmt: str):
+    """Raise if fmt is unknown or needs pyarrow and pyarrow is not installed"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {', '.join(FORMATS)}")
+    if fmt != "csv" and pa is None:
+        raise ValueError(f"Export format '{fmt}' requires pyarrow (pip install pyarrow)")
+
+
+def format_for_path(path: str, fmt: Optional[str] = None) -> str:
+    """The explicit format if given, else the one implied by the file extension, defaulting to CSV"""
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return {"parquet": "parquet", "pq": "parquet", "arrow": "arrow", "feather": "arrow"}.get(ext, "csv")
+
+
+def _schema(fieldnames: List[str]):
+    types = {"instrument": pa.string(), "type": pa.string(), "expiry": pa.date32(), "dte": pa.int32()}
+    return pa.schema([(name, types.get(name, pa.float64())) for name in fieldnames])
+
+
+def _batch(rows: List[Dict[str, Any]], schema):
+    arrays = []
+    for field in schema:
+        values = [row.get(field.name) for row in rows]
+        if field.name == "expiry":
+            values = [dt.date.fromisoformat(v) if isinstance(v, str) else v for v in values]
+        # NaN metrics become nulls so readers see them as missing
+        arrays.append(pa.array(values, type=field.type, from_pandas=True))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _DrainSink(io.RawIOBase):
+    """Write-only sink whose bytes are handed out as they arrive, keeping absolute offsets"""
+
+    def __init__(self):
+        self.position = 0
+        self._pending: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._pending.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data, self._pending = b"".join(self._pending), []
+        return data
+
+
+def _batches(rows: Iterable[Dict[str, Any]], schema, chunk_rows: int) -> Iterator[Any]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            yield _batch(chunk, schema)
+            chunk = []
+    if chunk:
+        yield _batch(chunk, schema)
+
+
+def parquet_chunks(rows: Iterable[Dict[str, Any]], fieldnames: List[str],
+                   chunk_rows: int = 10000) -> Iterator[bytes]:
+    """Parquet file written one row group per chunk_rows rows"""
+    check_format("parquet")
+    schema = _schema(fieldnames)
+    sink = _DrainSink()
+    writer = pq.ParquetWriter(sink, schema, compression=COMPRESSION)
+    try:
+        for batch in _batches(rows, schema, chunk_rows):
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def arrow_chunks(rows: Iterable[Dict[str, Any]], fieldnames: List[str],
+                 chunk_rows: int = 10000) -> Iterator[bytes]:
+    """Arrow IPC file (Feather v2) written one record batch per chunk_rows rows"""
+    check_format("arrow")
+    schema = _schema(fieldnames)
+    sink = _DrainSink()
+    writer = pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(compression=COMPRESSION))
+    try:
+        for batch in _batches(rows, schema, chunk_rows):
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_chunks(fmt: str, rows: Iterable[Dict[str, Any]], fieldnames: List[str]) -> Iterator[bytes]:
+    """Byte chunks of rows serialized in the given export format"""
+    check_format(fmt)
+    if fmt == "parquet":
+        return parquet_chunks(rows, fieldnames)
+    if fmt == "arrow":
+        return arrow_chunks(rows, fieldnames)
+    return csv_chunks(rows, fieldnames)
+
+
+def write_dataframe(df, path: str, fmt: str = "csv"):
+    """Write a scan DataFrame to path in the given export format"""
+    check_format(fmt)
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+        return
+    with open(path, "wb") as f:
+        for chunk in export_chunks(fmt, df.to_dict("records"), list(df.columns)):
+            f.write(chunk)
@@ -0,0 +1,106 @@
+"""
+Relevance ordering for per-instrument ticker fetches.
+
+When tickers have to be fetched one by one, the order matters: with a
+deadline or a progressive stream, whatever is fetched first is what the
+user sees first. QuoteHistory remembers the last delta, mid price and IV
+seen for each instrument, and fetch_order() puts first the instruments
+whose last observation passed the requested delta and premium filters,
+then those never seen, then those that failed, each group nearest the
+money first.
+"""
+
+import math
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from instruments import InstrumentRegistry
+
+
+class QuoteHistory:
+    """Thread-safe last-known abs delta, native mid price and mark IV per instrument"""
+
+    def __init__(self):
+        self._quotes: Dict[str, Tuple[float, float, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, ticker: Dict[str, Any]):
+        """Remember the fields of a ticker that the filters look at"""
+        delta = (ticker.get("greeks") or {}).get("delta")
+        bid, ask = ticker.get("best_bid"), ticker.get("best_ask")
+        mark, last = ticker.get("mark_price"), ticker.get("last_price")
+        # Same mid estimate as the scan
+        if bid is not None and ask is not None and bid > 0 and ask > 0:
+            mid = 0.5 * (bid + ask)
+        elif mark is not None and mark > 0:
+            mid = mark
+        else:
+            mid = last
+        iv = ticker.get("mark_iv")
+        entry = (
+            abs(float(delta)) if delta is not None else math.nan,
+            float(mid) if mid is not None else math.nan,
+            float(iv) / 100.0 if iv else math.nan,
+            time.time(),
+        )
+        with self._lock:
+            self._quotes[name] = entry
+
+    def record_all(self, tickers: Dict[str, Dict[str, Any]]):
+        for name, ticker in tickers.items():
+            if ticker is not None:
+                self.record(name, ticker)
+
+    def columns(self, registry: InstrumentRegistry, rows: np.ndarray) -> Dict[str, np.ndarray]:
+        """Last-known abs_delta, mid (native) and iv (fraction) for registry rows; NaN if unseen"""
+        out = {key: np.full(len(rows), np.nan) for key in ("abs_delta", "mid", "iv")}
+        with self._lock:
+            quotes = self._quotes
+            for k, i in enumerate(rows):
+                entry = quotes.get(registry.names[i])
+                if entry is not None:
+                    out["abs_delta"][k], out["mid"][k], out["iv"][k] = entry[:3]
+        return out
+
+
+def _filter_penalty(values: np.ndarray, lo: Optional[float], hi: Optional[float]) -> np.ndarray:
+    # 0 if last seen inside [lo, hi], 1 if never seen, 2 if last seen outside
+    if lo is None and hi is None:
+        return np.zeros(len(values), dtype=np.int64)
+    inside = np.ones(len(values), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        if lo is not None:
+            inside &= values >= lo
+        if hi is not None:
+            inside &= values <= hi
+    return np.where(np.isnan(values), 1, np.where(inside, 0, 2))
+
+
+def fetch_order(registry: InstrumentRegistry, rows: np.ndarray, spot: float, history: Optional[QuoteHistory] = None,
+                delta_band=None, prem_min=None, prem_max=None, premium_in_btc: bool = False) -> np.ndarray:
+    """
+    rows reordered so the instruments most likely to pass the filters come first.
+
+    Ranks by the total filter penalty of the last observation (delta band,
+    premium range), then by distance from the money |ln(strike / spot)|,
+    keeping registry order among ties.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    if len(rows) < 2:
+        return rows
+    with np.errstate(divide="ignore", invalid="ignore"):
+        moneyness = np.abs(np.log(registry.strike[rows] / spot)) if spot and spot > 0 else np.zeros(len(rows))
+    moneyness = np.where(np.isnan(moneyness), np.inf, moneyness)
+
+    penalty = np.zeros(len(rows), dtype=np.int64)
+    if history is not None and (delta_band or prem_min is not None or prem_max is not None):
+        seen = history.columns(registry, rows)
+        if delta_band:
+            penalty += _filter_penalty(seen["abs_delta"], delta_band[0], delta_band[1])
+        if prem_min is not None or prem_max is not None:
+            premium = seen["mid"] * spot if premium_in_btc else seen["mid"]
+            penalty += _filter_penalty(premium, prem_min, prem_max)
+    return rows[np.lexsort((np.arange(len(rows)), moneyness, penalty))]
@@ -0,0 +1,109 @@
+"""
+Stale-while-revalidate caching with per-request freshness budgets.
+
+A Freshness budget has a soft TTL (entries younger than this are served
+as-is), and a hard TTL (entries older than this must be refetched before
+they are served). Entries in between are served immediately while a
+background refresh brings them up to date. Callers pick the budget per
+request, e.g. the web UI accepts 5 s of staleness while the CSV export
+accepts 60 s.
+
+Snapshot-served endpoints (/scan, /scan/table, /export) apply the budget
+to the whole market snapshot in MarketDataService.get_snapshot. SWRCache
+holds per-instrument quotes for live scans (/scan/progressive,
+BTCOptionsScanner.scan). Snapshot builds bypass it, so a snapshot's age
+is the true age of its quotes.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+from singleflight import SingleFlight
+
+
+@dataclass(frozen=True)
+class Freshness:
+    """How old cached data may be: served as-is up to soft_ttl, never beyond hard_ttl"""
+
+    soft_ttl: float
+    hard_ttl: float
+
+    @classmethod
+    def max_stale(cls, seconds: float, refresh_after: Optional[float] = None) -> "Freshness":
+        """Budget allowing data up to seconds old, revalidating after half of that by default"""
+        seconds = max(0.0, float(seconds))
+        soft = seconds / 2.0 if refresh_after is None else min(float(refresh_after), seconds)
+        return cls(soft_ttl=soft, hard_ttl=seconds)
+
+
+class SWRCache:
+    """Thread-safe, size-bounded stale-while-revalidate cache"""
+
+    def __init__(self, max_entries: int = 10000, refresh_workers: int = 4):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._flight = SingleFlight()
+        self._pool = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="swr-refresh")
+
+    def get(self, key: Hashable, fetch: Callable[[], Any], freshness: Freshness,
+            refresh: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Return the value for key within the freshness budget, fetching it if needed.
+
+        Without refresh, fetch must not depend on the caller: it serves both
+        inline misses, coalesced across callers, and background refreshes.
+        Pass a caller-bound fetch (one with the caller's deadline or stats)
+        together with a caller-independent refresh instead. The fetch then
+        runs uncoalesced, so its failures never reach other callers, and
+        only refresh runs in the background, where the caller is long gone.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = now - fetched_at
+            if age <= freshness.soft_ttl:
+                return value
+            if age <= freshness.hard_ttl:
+                self._revalidate(key, fetch if refresh is None else refresh)
+                return value
+        if refresh is not None:
+            return self._fetch(key, fetch)
+        value, _ = self._flight.do(key, lambda: self._fetch(key, fetch))
+        return value
+
+    def put(self, key: Hashable, value: Any, fetched_at: Optional[float] = None):
+        with self._lock:
+            self._entries[key] = (value, time.time() if fetched_at is None else fetched_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _fetch(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        value = fetch()
+        self.put(key, value)
+        return value
+
+    def _revalidate(self, key: Hashable, fetch: Callable[[], Any]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._pool.submit(self._background_fetch, key, fetch)
+
+    def _background_fetch(self, key: Hashable, fetch: Callable[[], Any]):
+        try:
+            self._flight.do(key, lambda: self._fetch(key, fetch))
+        except Exception as e:
+            logging.warning(f"Background refresh of {key!r} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
@@ -0,0 +1,252 @@
+"""
+Cached Deribit instrument list and the registry built from it.
+
+The option instrument list only changes when Deribit lists new strikes or
+expiries, or when an expiry rolls off at 08:00 UTC. InstrumentCache keeps the
+list for a TTL, forces a refresh at the first rollover or instrument expiry
+after it was loaded, and records which instruments were added or removed by
+each refresh. After a failed refresh it waits retry_after seconds before
+trying again, serving the cached list meanwhile.
+
+Each refresh also builds an InstrumentRegistry: the exchange metadata
+(expiration timestamp, strike, option type) held in NumPy arrays, so scans
+never parse instrument names, plus an expiry -> side -> sorted strike index so
+expiry, DTE, side and strike filters resolve by lookup and bisection.
+"""
+
+import bisect
+import datetime as dt
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+ROLLOVER_HOUR_UTC = 8
+SECONDS_PER_YEAR = 365.0 * 86400.0
+
+
+def next_rollover(now: float) -> float:
+    """Epoch seconds of the first 08:00 UTC strictly after now"""
+    t = dt.datetime.fromtimestamp(now, dt.timezone.utc)
+    roll = t.replace(hour=ROLLOVER_HOUR_UTC, minute=0, second=0, microsecond=0)
+    if roll <= t:
+        roll += dt.timedelta(days=1)
+    return roll.timestamp()
+
+
+def parse_instrument_name(name: str) -> Tuple[Optional[int], Optional[float], Optional[bool]]:
+    """Fallback for instruments without metadata: (expiry ms, strike, is_call) from the name"""
+    try:
+        parts = name.split("-")
+        expiry = dt.datetime.strptime(parts[1], "%d%b%y").replace(hour=ROLLOVER_HOUR_UTC, tzinfo=dt.timezone.utc)
+        return int(expiry.timestamp() * 1000), float(parts[2]), parts[3].upper() == "C"
+    except Exception:
+        return None, None, None
+
+
+class InstrumentRegistry:
+    """
+    Array-backed view of an instrument list, built once per refresh.
+
+    Row i of every array describes names[i]; index maps a name to its row.
+    """
+
+    def __init__(self, instruments: List[Dict[str, Any]]):
+        names, expiry_ms, strikes, is_call = [], [], [], []
+        for ins in instruments:
+            name = ins.get("instrument_name")
+            if not name:
+                continue
+            ts = ins.get("expiration_timestamp")
+            strike = ins.get("strike")
+            option_type = ins.get("option_type")
+            if ts is None or strike is None or option_type not in ("call", "put"):
+                ts, strike, call = parse_instrument_name(name)
+                if ts is None:
+                    continue
+            else:
+                call = option_type == "call"
+            names.append(name)
+            expiry_ms.append(ts)
+            strikes.append(strike)
+            is_call.append(call)
+
+        self.names = names
+        self.name_array = np.array(names, dtype=object)
+        self.index = {name: i for i, name in enumerate(names)}
+        self.expiry_ms = np.array(expiry_ms, dtype=np.int64)
+        self.strike = np.array(strikes, dtype=np.float64)
+        self.is_call = np.array(is_call, dtype=bool)
+        # Deribit expiries are at 08:00 UTC, so the UTC day is the expiry date
+        self.expiry_date = (self.expiry_ms // 86400000).astype("datetime64[D]")
+
+        # Registries are shared between concurrent scans, so keep them read-only
+        for arr in (self.name_array, self.expiry_ms, self.strike, self.is_call, self.expiry_date):
+            arr.setflags(write=False)
+
+        # expiry date -> is_call -> (sorted strikes, matching rows)
+        days, inverse = np.unique(self.expiry_date, return_inverse=True)
+        self.expiries: List[dt.date] = [d.item() for d in days]
+        self._by_expiry: Dict[dt.date, Dict[bool, Tuple[np.ndarray, np.ndarray]]] = {}
+        for k, day in enumerate(self.expiries):
+            sides = {}
+            for call in (True, False):
+                rows = np.nonzero((inverse == k) & (self.is_call == call))[0]
+                order = np.argsort(self.strike[rows], kind="stable")
+                sides[call] = (self.strike[rows][order], rows[order])
+            self._by_expiry[day] = sides
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def years_to_expiry(self, now: Optional[float] = None) -> np.ndarray:
+        """Exact fractional years to expiry, floored at 1e-6"""
+        now = time.time() if now is None else now
+        return np.maximum((self.expiry_ms / 1000.0 - now) / SECONDS_PER_YEAR, 1e-6)
+
+    def select(self, expiry: Optional[dt.date] = None, dte_max: Optional[int] = None, side: str = "both",
+               strike_min: Optional[float] = None, strike_max: Optional[float] = None,
+               today: Optional[dt.date] = None) -> np.ndarray:
+        """
+        Rows passing the instrument-level filters, in registry order.
+
+        expiry takes precedence over dte_max, as in the scanners; with
+        neither, every expiry is included.
+        """
+        if expiry is not None:
+            days = [expiry] if expiry in self._by_expiry else []
+        elif dte_max is not None:
+            today = dt.date.today() if today is None else today
+            lo = bisect.bisect_left(self.expiries, today)
+            hi = bisect.bisect_right(self.expiries, today + dt.timedelta(days=dte_max))
+            days = self.expiries[lo:hi]
+        else:
+            days = self.expiries
+        sides = [True] if side == "calls" else [False] if side == "puts" else [True, False]
+
+        selected = []
+        for day in days:
+            for call in sides:
+                strikes, rows = self._by_expiry[day][call]
+                lo = 0 if strike_min is None else np.searchsorted(strikes, strike_min, side="left")
+                hi = len(strikes) if strike_max is None else np.searchsorted(strikes, strike_max, side="right")
+                selected.append(rows[lo:hi])
+        if not selected:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(selected))
+
+    def days_to_expiry(self, today: Optional[dt.date] = None) -> np.ndarray:
+        """Whole calendar days from today to each expiry date"""
+        today = dt.date.today() if today is None else today
+        return (self.expiry_date - np.datetime64(today, "D")).astype(np.int64)
+
+
+class InstrumentCache:
+    """Thread-safe TTL cache around an instrument-list fetch function"""
+
+    def __init__(self, fetch: Callable[..., List[Dict[str, Any]]], ttl: float = 300, retry_after: float = 10):
+        """
+        Args:
+            fetch: Called as fetch(stats) to download the instrument list
+            ttl: Maximum age of the cached list in seconds
+            retry_after: Seconds to wait after a failed refresh before trying again
+        """
+        self.fetch = fetch
+        self.ttl = ttl
+        self.retry_after = retry_after
+        # Until then, callers get the cached list (or the last error) instead of another fetch
+        self.retry_at = 0.0
+        self.last_error: Optional[Exception] = None
+        self.instruments: List[Dict[str, Any]] = []
+        self.registry = InstrumentRegistry([])
+        self.loaded_at = 0.0
+        self.expires_at = 0.0
+        self.last_diff: Dict[str, List[str]] = {"added": [], "removed": []}
+        self._lock = threading.Lock()
+        # Guards only the background refresh thread, never held across a fetch
+        self._background_lock = threading.Lock()
+        self._background: Optional[threading.Thread] = None
+
+    def is_stale(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return not self.instruments or now >= self.expires_at
+
+    def get(self, stats=None, force: bool = False, wait: bool = True) -> List[Dict[str, Any]]:
+        """
+        Return the instrument list, refreshing it first if stale or forced.
+
+        With wait=False a stale list is returned at once and refreshed on a
+        background thread instead; only an empty cache is fetched inline.
+        """
+        if not force and not self.is_stale():
+            return self.instruments
+        if not force and not wait and self.instruments:
+            self._refresh_in_background()
+            return self.instruments
+        with self._lock:
+            # Another thread may have refreshed while we waited
+            if force or self.is_stale():
+                if not force and time.time() < self.retry_at:
+                    # A refresh failed moments ago; do not hold the lock for another one yet
+                    if not self.instruments:
+                        raise Exception(f"Instrument list unavailable: {str(self.last_error)}")
+                    return self.instruments
+                try:
+                    self.refresh(stats)
+                except Exception as e:
+                    self.last_error = e
+                    self.retry_at = time.time() + self.retry_after
+                    if not self.instruments:
+                        raise
+                    logging.warning(f"Instrument refresh failed, serving cached list: {str(e)}")
+            return self.instruments
+
+    def get_registry(self, stats=None, force: bool = False, wait: bool = True) -> InstrumentRegistry:
+        """Return the registry for the current instrument list (see get() for wait)"""
+        self.get(stats, force, wait)
+        return self.registry
+
+    def _refresh_in_background(self):
+        with self._background_lock:
+            if self._background is not None and self._background.is_alive():
+                return
+            # The caller may be gone by the time this runs, so it is not charged to its stats
+            self._background = threading.Thread(target=self._background_refresh, name="instrument-refresh",
+                                                daemon=True)
+            self._background.start()
+
+    def _background_refresh(self):
+        try:
+            self.get()
+        except Exception as e:
+            logging.warning(f"Background instrument refresh failed: {str(e)}")
+
+    def refresh(self, stats=None):
+        """Download the list, diff it against the cached one and reset the expiry"""
+        instruments = self.fetch(stats)
+        now = time.time()
+
+        old_names = {ins.get("instrument_name") for ins in self.instruments}
+        new_names = {ins.get("instrument_name") for ins in instruments}
+        if self.instruments:
+            self.last_diff = {
+                "added": sorted(n for n in new_names - old_names if n),
+                "removed": sorted(n for n in old_names - new_names if n),
+            }
+        else:
+            self.last_diff = {"added": sorted(n for n in new_names if n), "removed": []}
+
+        # Refresh at the TTL, the daily rollover or the first expiry, whichever comes first
+        expires_at = min(now + self.ttl, next_rollover(now))
+        expiries = [ins["expiration_timestamp"] / 1000.0 for ins in instruments
+                    if ins.get("expiration_timestamp")]
+        upcoming = [t for t in expiries if t > now]
+        if upcoming:
+            expires_at = min(expires_at, min(upcoming))
+
+        self.registry = InstrumentRegistry(instruments)
+        self.instruments = instruments
+        self.loaded_at = now
+        self.expires_at = expires_at
@@ -0,0 +1,220 @@
+"""
+Live scan results pushed to browsers as Server-Sent Events.
+
+A client registers a scan parameter set and gets a feed id; identical
+parameter sets share one feed. Whenever a new market snapshot is published,
+LiveScanHub rescans each feed once, diffs the result against the previous
+one (rows inserted, changed and removed, keyed by instrument) and fans the
+serialized event out to every subscriber of that feed. The cost per refresh
+is one scan per distinct parameter set, however many browsers listen.
+"""
+
+import hashlib
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from export import json_safe
+from result_cache import ResultTokens, normalize_params
+
+
+def _sse(event: str, event_id: int, payload: Dict[str, Any]) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+
+class _Subscriber:
+    def __init__(self, queue_size: int):
+        self.queue: "queue.Queue[str]" = queue.Queue(queue_size)
+        # Set when the client fell behind; it gets a fresh reset instead of the backlog
+        self.overflowed = False
+
+
+class ScanFeed:
+    """The latest rows of one registered parameter set and its subscribers"""
+
+    def __init__(self, feed_id: str, params: Dict[str, Any]):
+        self.id = feed_id
+        self.params = params
+        self.version = 0
+        self.event_id = 0
+        self.meta: Dict[str, Any] = {}
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.order: List[str] = []
+        self.subscribers = set()
+        self.idle_since = time.time()
+        self.lock = threading.Lock()
+
+    def reset_event(self) -> str:
+        """The whole current result, sent to new or lagging subscribers"""
+        payload = dict(self.meta, rows=[self.rows[name] for name in self.order])
+        return _sse("reset", self.event_id, payload)
+
+
+class LiveScanHub:
+    """Recomputes registered scans on every new snapshot and fans out row diffs"""
+
+    def __init__(self, market, compute: Callable[[Any, Dict[str, Any]], Dict[str, Any]],
+                 tokens: Optional[ResultTokens] = None, interval: float = 1.0, heartbeat: float = 15.0,
+                 idle_ttl: float = 300.0, queue_size: int = 64):
+        """
+        Args:
+            market: market.MarketDataService publishing snapshots
+            compute: Called as compute(snapshot, params) to scan a snapshot
+            tokens: If given, each update carries a result token for the full result
+            interval: How often to check for a new snapshot when none is published
+            heartbeat: Seconds between keep-alive comments on idle streams
+            idle_ttl: Feeds without subscribers are dropped after this many seconds
+            queue_size: Events buffered per subscriber before it is reset
+        """
+        self.market = market
+        self.compute = compute
+        self.tokens = tokens
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.idle_ttl = idle_ttl
+        self.queue_size = queue_size
+        self.feeds: Dict[str, ScanFeed] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, params: Dict[str, Any]) -> str:
+        """Feed id for a parameter set, creating and computing the feed if needed"""
+        feed_id = hashlib.sha1(repr(normalize_params(params)).encode()).hexdigest()[:16]
+        with self._lock:
+            feed = self.feeds.get(feed_id)
+            if feed is None:
+                feed = self.feeds[feed_id] = ScanFeed(feed_id, dict(params))
+        if not feed.version:
+            self._update(feed, self.market.get_snapshot())
+        self._start()
+        return feed_id
+
+    def subscribe(self, feed_id: str) -> Iterator[str]:
+        """SSE text for one client: a reset with the current rows, then diffs as they happen"""
+        with self._lock:
+            feed = self.feeds.get(feed_id)
+        if feed is None:
+            raise KeyError(feed_id)
+        subscriber = _Subscriber(self.queue_size)
+        with feed.lock:
+            feed.subscribers.add(subscriber)
+            first = feed.reset_event()
+        return self._stream(feed, subscriber, first)
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _stream(self, feed: ScanFeed, subscriber: _Subscriber, first: str) -> Iterator[str]:
+        try:
+            yield f"retry: {int(self.interval * 1000) + 1000}\n" + first
+            while not self._stop.is_set():
+                try:
+                    event = subscriber.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscriber.overflowed:
+                    with feed.lock:
+                        while not subscriber.queue.empty():
+                            subscriber.queue.get_nowait()
+                        subscriber.overflowed = False
+                        event = feed.reset_event()
+                yield event
+        finally:
+            with feed.lock:
+                feed.subscribers.discard(subscriber)
+                if not feed.subscribers:
+                    feed.idle_since = time.time()
+
+    def _update(self, feed: ScanFeed, snapshot):
+        """Rescan one feed against snapshot and publish the diff to its subscribers"""
+        with feed.lock:
+            if snapshot.version <= feed.version:
+                return
+            results = self.compute(snapshot, feed.params)
+
+            rows = {}
+            for row in results["data"]:
+                # Cleaned before diffing, so NaN fields compare equal across refreshes
+                rows[row["instrument"]] = json_safe(row)
+            order = list(rows)
+            inserted = [rows[name] for name in order if name not in feed.rows]
+            changed = [rows[name] for name in order if name in feed.rows and feed.rows[name] != rows[name]]
+            removed = [name for name in feed.order if name not in rows]
+
+            feed.meta = {
+                "feed_id": feed.id,
+                "snapshot_version": snapshot.version,
+                "btc_spot": json_safe(results["btc_spot"]),
+                "total_count": results["total_count"],
+                "fetched_at": snapshot.fetched_at,
+            }
+            if self.tokens is not None:
+                # One token per feed, so refreshes do not crowd out tokens issued by /scan
+                feed.meta["result_token"] = self.tokens.issue(snapshot, dict(feed.params, limit=None),
+                                                              slot=feed.id)
+            payload = dict(feed.meta, inserted=inserted, changed=changed, removed=removed)
+            if order != feed.order:
+                payload["order"] = order
+
+            first = not feed.version
+            feed.version = snapshot.version
+            feed.rows, feed.order = rows, order
+            feed.event_id += 1
+            if first:
+                return
+            # Serialized once, shared by every subscriber
+            event = _sse("diff", feed.event_id, payload)
+            for subscriber in feed.subscribers:
+                try:
+                    subscriber.queue.put_nowait(event)
+                except queue.Full:
+                    subscriber.overflowed = True
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="live-scans", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        version = 0
+        while not self._stop.is_set():
+            self._expire_idle()
+            with self._lock:
+                if not self.feeds:
+                    # Nothing to rescan, so stop asking for snapshots; register() restarts the loop
+                    self._thread = None
+                    return
+            snapshot = self.market.wait_for_update(version, self.interval)
+            if snapshot is None:
+                # Without a background refresher, ask for a snapshot within its max age
+                try:
+                    snapshot = self.market.get_snapshot()
+                except Exception as e:
+                    logging.error(f"Live scan snapshot failed: {str(e)}")
+                    continue
+            if snapshot.version <= version:
+                continue
+            version = snapshot.version
+            with self._lock:
+                feeds = list(self.feeds.values())
+            for feed in feeds:
+                try:
+                    self._update(feed, snapshot)
+                except Exception as e:
+                    logging.error(f"Live scan {feed.id} failed: {str(e)}")
+
+    def _expire_idle(self):
+        now = time.time()
+        with self._lock:
+            for feed_id, feed in list(self.feeds.items()):
+                if not feed.subscribers and now - feed.idle_since > self.idle_ttl:
+                    del self.feeds[feed_id]
@@ -0,0 +1,186 @@
+"""
+Process-wide market data shared by all request handlers.
+
+MarketDataService produces immutable, versioned MarketSnapshot objects
+(spot, instrument registry, whole-chain quote columns, fetch time). Handlers
+grab the current snapshot with a single attribute read and compute against
+it, so many threads can scan concurrently without locks and without
+touching shared scanner state.
+
+With the background refresher running, the next snapshot is built off to
+the side and swapped in only once complete, so requests never wait on
+Deribit and never see a half-built chain.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+import deribit
+from freshness import Freshness
+from instruments import InstrumentRegistry
+from singleflight import SingleFlight
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """One complete, read-only view of the BTC option chain"""
+
+    version: int
+    spot: float
+    registry: InstrumentRegistry
+    # Quote columns aligned with registry rows (see columnar.ticker_columns)
+    quotes: Dict[str, np.ndarray]
+    fetched_at: float
+    fetch_stats: Dict[str, int]
+
+    def age(self, now: Optional[float] = None) -> float:
+        """Seconds since the snapshot's data was fetched"""
+        return (time.time() if now is None else now) - self.fetched_at
+
+
+class MarketDataService:
+    """Builds market snapshots with a scanner and hands out the latest one"""
+
+    def __init__(self, scanner, max_age: float = 5.0, deadline_ms: Optional[float] = None):
+        """
+        Args:
+            scanner: BTCOptionsScanner used to fetch spot, instruments and quotes
+            max_age: Snapshots older than this many seconds are rebuilt on demand
+            deadline_ms: Optional time budget for a build's quote fetches; quotes
+                still outstanding then are left out of that snapshot
+        """
+        self.scanner = scanner
+        self.max_age = max_age
+        self.deadline_ms = deadline_ms
+        self.first_snapshot_timeout = 30.0
+        self.current: Optional[MarketSnapshot] = None
+        self._versions = itertools.count(1)
+        # Serializes publishing only; readers never take it
+        self._lock = threading.Lock()
+        self._updated = threading.Condition(self._lock)
+        self._published = threading.Event()
+        self._stop = threading.Event()
+        # Set by requests that want a fresher snapshot than the refresher has
+        self._wake = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        self._flight = SingleFlight()
+        self._revalidating = False
+
+    def build(self) -> MarketSnapshot:
+        """Fetch the whole chain into a new snapshot and publish it"""
+        stats = deribit.CallStats()
+        spot, registry, quotes = self.scanner.fetch_market(stats, self.deadline_ms)
+        for col in quotes.values():
+            col.setflags(write=False)
+        with self._lock:
+            snapshot = MarketSnapshot(version=next(self._versions), spot=spot, registry=registry,
+                                      quotes=quotes, fetched_at=time.time(), fetch_stats=stats.as_dict())
+            # Readers see a single reference assignment; never go back to an older version
+            if self.current is None or self.current.version < snapshot.version:
+                self.current = snapshot
+                self._updated.notify_all()
+        self._published.set()
+        return snapshot
+
+    def get_snapshot(self, freshness: Optional[Freshness] = None) -> MarketSnapshot:
+        """
+        The current snapshot, within the caller's freshness budget.
+
+        While the background refresher runs, requests never wait on Deribit:
+        the current snapshot is returned with its real age whatever the budget,
+        and one older than freshness.hard_ttl only wakes the refresher early,
+        so steady polling does not override the refresh interval. Only the
+        very first snapshot is waited for.
+
+        Without the refresher, a snapshot younger than freshness.soft_ttl
+        (default max_age) is returned as-is; one up to hard_ttl old is returned
+        while a rebuild runs in the background; an older or missing one is
+        rebuilt inline, with concurrent callers coalesced onto a single build.
+        """
+        if freshness is None:
+            freshness = Freshness(self.max_age, self.max_age)
+        if self.refreshing():
+            snapshot = self.current
+            if snapshot is None and self._published.wait(self.first_snapshot_timeout):
+                snapshot = self.current
+            if snapshot is None:
+                raise Exception("Market data is not available yet, please try again shortly")
+            if snapshot.age() > freshness.hard_ttl:
+                self._wake.set()
+            return snapshot
+        snapshot = self.current
+        if snapshot is not None:
+            age = snapshot.age()
+            if age <= freshness.soft_ttl:
+                return snapshot
+            if age <= freshness.hard_ttl:
+                self._revalidate()
+                return snapshot
+        # Concurrent requests on a cold or stale cache share one build
+        snapshot, _ = self._flight.do("build", self.build)
+        return snapshot
+
+    def wait_for_update(self, version: int, timeout: Optional[float] = None) -> Optional[MarketSnapshot]:
+        """Block until a snapshot newer than version is published; None on timeout"""
+        with self._updated:
+            self._updated.wait_for(lambda: self.current is not None and self.current.version > version, timeout)
+            snapshot = self.current
+        return snapshot if snapshot is not None and snapshot.version > version else None
+
+    def _revalidate(self):
+        """Rebuild the snapshot on a background thread, one at a time"""
+        with self._lock:
+            if self._revalidating:
+                return
+            self._revalidating = True
+        threading.Thread(target=self._background_build, name="market-revalidate", daemon=True).start()
+
+    def _background_build(self):
+        try:
+            self._flight.do("build", self.build)
+        except Exception as e:
+            logging.error(f"Market snapshot revalidation failed: {str(e)}")
+        finally:
+            self._revalidating = False
+
+    def refreshing(self) -> bool:
+        """True while the background refresher thread is running"""
+        return self._refresher is not None and self._refresher.is_alive()
+
+    def start(self, interval: float = 5.0) -> "MarketDataService":
+        """Start rebuilding the snapshot every interval seconds in the background"""
+        if not self.refreshing():
+            self._stop.clear()
+            self._refresher = threading.Thread(target=self._refresh_loop, args=(interval,),
+                                               name="market-refresher", daemon=True)
+            self._refresher.start()
+        return self
+
+    def stop(self, timeout: float = 5):
+        """Stop the background refresher"""
+        self._stop.set()
+        self._wake.set()
+        if self._refresher is not None:
+            self._refresher.join(timeout)
+
+    def _refresh_loop(self, interval: float):
+        while not self._stop.is_set():
+            started = time.time()
+            try:
+                self._flight.do("build", self.build)
+                # Wakes during the build are answered by it; later requests
+                # past their budget may still cut the wait short
+                self._wake.clear()
+                if not self._stop.is_set():
+                    self._wake.wait(max(0.0, interval - (time.time() - started)))
+            except Exception as e:
+                # Keep serving the previous snapshot; its age tells clients it is stale.
+                # Retry on the regular schedule so an outage is not hammered on every request
+                logging.error(f"Market snapshot refresh failed: {str(e)}")
+                self._stop.wait(max(0.0, interval - (time.time() - started)))
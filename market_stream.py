@@ -0,0 +1,197 @@
+"""
+Live BTC option chain fed by Deribit's JSON-RPC WebSocket API.
+
+ChainSubscriber runs in a background thread, subscribes to the ticker channel
+of every BTC option (plus BTC-PERPETUAL for spot) and keeps the latest ticker
+per instrument in memory, where BTCOptionsScanner.scan() can read it without
+any REST calls.
+
+The endpoint is configurable (DERIBIT_WS_URL), so the subscriber can be run
+offline against a local server that replays recorded messages, such as
+tests/ws_replay.py with the recordings in tests/fixtures. Recorded messages
+can also be fed straight into handle_message().
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import websocket
+
+from instruments import InstrumentRegistry
+
+DERIBIT_WS = os.environ.get("DERIBIT_WS_URL", "wss://www.deribit.com/ws/api/v2")
+SPOT_INSTRUMENT = "BTC-PERPETUAL"
+SUBSCRIBE_BATCH = 100
+
+logger = logging.getLogger(__name__)
+
+
+class ChainSubscriber:
+    """Background WebSocket subscriber maintaining an in-memory option chain"""
+
+    def __init__(self, url: str = DERIBIT_WS, currency: str = "BTC", interval: str = "100ms",
+                 heartbeat: int = 30, instruments_refresh: float = 600, reconnect_delay: float = 5):
+        """
+        Args:
+            url: JSON-RPC WebSocket endpoint
+            currency: Currency whose options are tracked
+            interval: Ticker channel interval ('raw', '100ms' or 'agg2')
+            heartbeat: Heartbeat interval requested from the server, in seconds
+            instruments_refresh: How often to re-request the instrument list, in seconds
+            reconnect_delay: Pause before reconnecting after a dropped connection, in seconds
+        """
+        self.url = url
+        self.currency = currency
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.instruments_refresh = instruments_refresh
+        self.reconnect_delay = reconnect_delay
+
+        # Written only by the subscriber thread; readers get whole-object swaps
+        self.tickers: Dict[str, Dict[str, Any]] = {}
+        self.instruments: List[Dict[str, Any]] = []
+        self.registry = InstrumentRegistry([])
+        self.connected = False
+        self.last_message = 0.0
+
+        self._ws = None
+        self._next_id = 0
+        self._pending: Dict[int, str] = {}
+        self._subscribed = set()
+        self._instruments_requested = 0.0
+        self._send_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "ChainSubscriber":
+        """Start the subscriber thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="deribit-chain", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5):
+        """Stop the subscriber thread and close the connection"""
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_live(self, max_silence: Optional[float] = None) -> bool:
+        """True while connected, holding a chain and hearing from the server"""
+        if max_silence is None:
+            max_silence = 2 * self.heartbeat
+        return (self.connected and bool(self.instruments)
+                and time.time() - self.last_message <= max_silence)
+
+    def get_ticker(self, name: str) -> Optional[Dict[str, Any]]:
+        """Latest ticker for an instrument, or None if none has been received"""
+        return self.tickers.get(name)
+
+    def get_spot(self) -> Optional[float]:
+        """BTC spot from the perpetual's ticker, or None if not yet received"""
+        data = self.tickers.get(SPOT_INSTRUMENT) or {}
+        for key in ("index_price", "mark_price", "last_price"):
+            if data.get(key):
+                return float(data[key])
+        return None
+
+    def handle_message(self, msg: Dict[str, Any]):
+        """Apply one decoded JSON-RPC message to the chain"""
+        self.last_message = time.time()
+        method = msg.get("method")
+        if method == "subscription":
+            params = msg.get("params", {})
+            data = params.get("data")
+            if params.get("channel", "").startswith("ticker.") and isinstance(data, dict):
+                name = data.get("instrument_name")
+                if name:
+                    self.tickers[name] = data
+        elif method == "heartbeat":
+            if msg.get("params", {}).get("type") == "test_request":
+                self._send("public/test", {})
+        elif "id" in msg:
+            request = self._pending.pop(msg["id"], None)
+            if "error" in msg:
+                logger.warning("Deribit WebSocket %s failed: %s", request, msg["error"])
+            elif request == "public/get_instruments":
+                self._set_instruments(msg.get("result") or [])
+
+    def _set_instruments(self, instruments: List[Dict[str, Any]]):
+        names = {ins["instrument_name"] for ins in instruments if ins.get("instrument_name")}
+        self.registry = InstrumentRegistry(instruments)
+        self.instruments = instruments
+        # Forget expired instruments; new ones get subscribed below
+        expired = [n for n in self.tickers if n not in names and n != SPOT_INSTRUMENT]
+        if expired:
+            tickers = dict(self.tickers)
+            for name in expired:
+                tickers.pop(name, None)
+            self.tickers = tickers
+        self._subscribed &= names | {SPOT_INSTRUMENT}
+        self._subscribe(sorted(names - self._subscribed))
+
+    def _subscribe(self, names: List[str]):
+        for i in range(0, len(names), SUBSCRIBE_BATCH):
+            batch = names[i:i + SUBSCRIBE_BATCH]
+            channels = [f"ticker.{name}.{self.interval}" for name in batch]
+            if self._send("public/subscribe", {"channels": channels}) is not None:
+                self._subscribed.update(batch)
+
+    def _request_instruments(self):
+        self._instruments_requested = time.time()
+        self._send("public/get_instruments", {"currency": self.currency, "kind": "option", "expired": False})
+
+    def _send(self, method: str, params: Dict[str, Any]) -> Optional[int]:
+        ws = self._ws
+        if ws is None:
+            return None
+        with self._send_lock:
+            self._next_id += 1
+            msg_id = self._next_id
+            self._pending[msg_id] = method
+            ws.send(json.dumps({"jsonrpc": "2.0", "id": msg_id, "method": method, "params": params}))
+        return msg_id
+
+    def _on_open(self):
+        self.connected = True
+        self._pending.clear()
+        self._subscribed.clear()
+        self._send("public/set_heartbeat", {"interval": self.heartbeat})
+        self._subscribe([SPOT_INSTRUMENT])
+        self._request_instruments()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._ws = websocket.create_connection(self.url, timeout=2 * self.heartbeat)
+                self._on_open()
+                while not self._stop.is_set():
+                    raw = self._ws.recv()
+                    if not raw:
+                        break
+                    self.handle_message(json.loads(raw))
+                    if time.time() - self._instruments_requested >= self.instruments_refresh:
+                        self._request_instruments()
+            except Exception as e:
+                if not self._stop.is_set():
+                    logger.warning("Deribit WebSocket connection lost: %s", e)
+            finally:
+                self.connected = False
+                ws, self._ws = self._ws, None
+                if ws is not None:
+                    try:
+                        ws.close()
+                    except Exception:
+                        pass
+            self._stop.wait(self.reconnect_delay)
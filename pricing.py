@@ -0,0 +1,73 @@
+"""
+Vectorized probability-of-profit kernels.
+
+Array counterparts of the scalar phi() and lognormal POP formulas.
+compute_pop() evaluates breakeven, pop_delta and pop_logN for a whole set of
+options in one pass, with the same NaN rules as the scalar per-row code.
+The normal CDF comes from SciPy's ndtr ufunc.
+"""
+
+import math
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from scipy.special import ndtr as _ndtr
+except ImportError:
+    _ndtr = None
+
+# Fallback for installs without SciPy (see requirements.txt); loops in Python per element
+_erf = np.vectorize(math.erf, otypes=[np.float64])
+
+
+def phi(x: np.ndarray) -> np.ndarray:
+    """Standard normal cumulative distribution function, as one ufunc call via scipy.special.ndtr"""
+    x = np.asarray(x, dtype=np.float64)
+    if _ndtr is not None:
+        return _ndtr(x)
+    if x.size == 0:
+        return x.copy()
+    return 0.5 * (1.0 + _erf(x / math.sqrt(2.0)))
+
+
+def lognormal_pop_threshold(S0: np.ndarray, sigma: np.ndarray, T_years: np.ndarray,
+                            threshold: np.ndarray, le: np.ndarray) -> np.ndarray:
+    """
+    P(S_T <= threshold) where le is True, P(S_T >= threshold) elsewhere.
+
+    NaN wherever any input is non-positive (or NaN), like the scalar version.
+    """
+    S0, sigma, T_years, threshold = np.broadcast_arrays(
+        *(np.asarray(a, dtype=np.float64) for a in (S0, sigma, T_years, threshold)))
+    ok = (S0 > 0) & (sigma > 0) & (T_years > 0) & (threshold > 0)
+    out = np.full(ok.shape, np.nan)
+    if ok.any():
+        s, t = sigma[ok], T_years[ok]
+        z = (np.log(threshold[ok] / S0[ok]) + 0.5 * s * s * t) / (s * np.sqrt(t))
+        p_le = phi(z)
+        out[ok] = np.where(np.broadcast_to(le, ok.shape)[ok], p_le, 1.0 - p_le)
+    return out
+
+
+def compute_pop(spot: np.ndarray, strike: np.ndarray, iv: np.ndarray, T_years: np.ndarray,
+                premium_usd: np.ndarray, is_call: np.ndarray,
+                delta: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Breakeven, delta POP and lognormal POP for arrays of options.
+
+    Missing IV or delta must be passed as NaN. Breakeven and pop_logN are
+    only defined where IV, premium and spot are all positive; puts floor the
+    breakeven at 1e-6.
+    """
+    spot, strike, iv, T_years, premium_usd, delta = np.broadcast_arrays(
+        *(np.asarray(a, dtype=np.float64) for a in (spot, strike, iv, T_years, premium_usd, delta)))
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), spot.shape)
+
+    pop_delta = 1.0 - np.abs(delta)
+
+    priced = (iv > 0) & (premium_usd > 0) & (spot > 0)
+    breakeven = np.where(is_call, strike + premium_usd, np.maximum(strike - premium_usd, 1e-6))
+    breakeven = np.where(priced, breakeven, np.nan)
+    pop_logN = lognormal_pop_threshold(spot, iv, T_years, breakeven, is_call)
+    return breakeven, pop_delta, pop_logN
@@ -0,0 +1,149 @@
+"""
+Pre-fetch pruning of instruments that cannot pass the delta or premium filters.
+
+Instruments not covered by the live stream or the bulk book summary cost one
+get_ticker call each. Before paying for it, delta (and premium) can be
+estimated from spot, strike, time to expiry and an IV, and instruments
+outside the requested bands skipped.
+
+Two modes:
+
+- "strict" prunes on delta only, and only when no IV within IV_BOUNDS and
+  no underlying price within SPOT_BASIS of spot could put |delta| inside
+  the band. The upper IV bound of each expiry is raised to the highest IV
+  seen in it (see strict_iv_ceiling), and options within STRICT_MIN_DAYS of
+  expiry are never pruned: IV and basis there can go far past the bounds.
+  As long as the exchange's delta is Black-Scholes at such an IV and
+  underlying, nothing that would have passed the filter is skipped. Not
+  covered: an expiry with no quotes seen yet whose IV is above IV_BOUNDS,
+  an IV jump past the highest seen, and a basis beyond SPOT_BASIS.
+- "likely" uses the last-known IV of each instrument (else the median IV
+  seen in its expiry, else across the chain) and spot, and prunes on delta
+  and premium with the tolerances below. Much more aggressive, but may
+  occasionally skip an instrument whose quotes moved.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+import pricing
+from fetch_priority import QuoteHistory
+from instruments import InstrumentRegistry
+
+MODES = ("strict", "likely")
+# Annualized IVs outside this range are not expected on BTC options
+IV_BOUNDS = (0.05, 3.0)
+# Deribit greeks use the expiry's futures price; allow for its basis to index spot
+SPOT_BASIS = 0.05
+# "strict" mode never prunes options this close to expiry
+STRICT_MIN_DAYS = 2.0
+# "likely" mode tolerances: delta band widened by this much, premium range by this factor
+DELTA_MARGIN = 0.05
+PREMIUM_FACTOR = 1.5
+
+
+def _d1_range(spot_lo, spot_hi, strike, T, iv_lo, iv_hi):
+    """Smallest and largest d1 over the spot and IV intervals"""
+    sqrt_t = np.sqrt(T)
+    x_lo, x_hi = iv_lo * sqrt_t, iv_hi * sqrt_t
+
+    def d1(a, x):
+        return a / x + 0.5 * x
+
+    # d1 = a/x + x/2 in x = sigma*sqrt(T) rises with spot; for a > 0 it has
+    # its minimum at x = sqrt(2a), otherwise it is increasing in x
+    a_lo, a_hi = np.log(spot_lo / strike), np.log(spot_hi / strike)
+    x_min = np.clip(np.sqrt(2.0 * np.maximum(a_lo, 0.0)), x_lo, x_hi)
+    return d1(a_lo, x_min), np.maximum(d1(a_hi, x_lo), d1(a_hi, x_hi))
+
+
+def abs_delta_range(spot_lo, spot_hi, strike, T, iv_lo, iv_hi, is_call):
+    """Bounds on |Black-Scholes delta| over the spot and IV intervals"""
+    d1_min, d1_max = _d1_range(spot_lo, spot_hi, strike, T, iv_lo, iv_hi)
+    lo = np.where(is_call, pricing.phi(d1_min), pricing.phi(-d1_max))
+    hi = np.where(is_call, pricing.phi(d1_max), pricing.phi(-d1_min))
+    return lo, hi
+
+
+def native_price(spot, strike, T, iv, is_call):
+    """Black-Scholes option price in units of the underlying (Deribit's BTC quote)"""
+    x = iv * np.sqrt(T)
+    d1 = np.log(spot / strike) / x + 0.5 * x
+    d2 = d1 - x
+    call = pricing.phi(d1) - strike / spot * pricing.phi(d2)
+    put = strike / spot * pricing.phi(-d2) - pricing.phi(-d1)
+    return np.where(is_call, call, put)
+
+
+def estimated_iv(registry: InstrumentRegistry, rows: np.ndarray, history: QuoteHistory) -> np.ndarray:
+    """Last-known IV per row, filled from its expiry's median, then the chain median; NaN if none"""
+    iv = history.columns(registry, rows)["iv"]
+    known = ~np.isnan(iv)
+    if known.all() or not known.any():
+        return iv
+    expiry = registry.expiry_ms[rows]
+    for day in np.unique(expiry[~known]):
+        same = expiry == day
+        if (same & known).any():
+            iv[same & ~known] = np.median(iv[same & known])
+    chain = np.median(iv[known])
+    return np.where(np.isnan(iv), chain, iv)
+
+
+def strict_iv_ceiling(registry: InstrumentRegistry, rows: np.ndarray,
+                      history: Optional[QuoteHistory] = None) -> np.ndarray:
+    """Upper IV bound per row: IV_BOUNDS[1], or the highest IV seen in the row's expiry if above it"""
+    ceiling = np.full(len(rows), IV_BOUNDS[1])
+    if history is None or not len(rows):
+        return ceiling
+    expiry = registry.expiry_ms[rows]
+    # Look at every listed instrument of these expiries, not just the rows to fetch
+    same_expiry = np.flatnonzero(np.isin(registry.expiry_ms, expiry))
+    iv = history.columns(registry, same_expiry)["iv"]
+    seen = ~np.isnan(iv)
+    for day in np.unique(registry.expiry_ms[same_expiry[seen]]):
+        highest = iv[seen & (registry.expiry_ms[same_expiry] == day)].max()
+        ceiling[expiry == day] = max(IV_BOUNDS[1], highest)
+    return ceiling
+
+
+def prune_mask(registry: InstrumentRegistry, rows: np.ndarray, spot: float, mode: str,
+               history: Optional[QuoteHistory] = None, delta_band=None, prem_min=None, prem_max=None,
+               premium_in_btc: bool = False, now: Optional[float] = None) -> np.ndarray:
+    """True for rows that can be skipped without fetching their ticker"""
+    if mode not in MODES:
+        raise ValueError(f"Unknown pruning mode '{mode}', expected one of {', '.join(MODES)}")
+    rows = np.asarray(rows, dtype=np.int64)
+    skip = np.zeros(len(rows), dtype=bool)
+    if not len(rows) or not spot or spot <= 0:
+        return skip
+    strike = registry.strike[rows]
+    T = registry.years_to_expiry(now)[rows]
+    is_call = registry.is_call[rows]
+
+    if mode == "strict":
+        if delta_band:
+            iv_hi = strict_iv_ceiling(registry, rows, history)
+            lo, hi = abs_delta_range(spot * (1 - SPOT_BASIS), spot * (1 + SPOT_BASIS), strike, T,
+                                     IV_BOUNDS[0], iv_hi, is_call)
+            skip |= ((hi < delta_band[0]) | (lo > delta_band[1])) & (T >= STRICT_MIN_DAYS / 365.0)
+        return skip
+
+    iv = estimated_iv(registry, rows, history) if history is not None else np.full(len(rows), np.nan)
+    known = iv > 0
+    if not known.any():
+        return skip
+    with np.errstate(invalid="ignore"):
+        if delta_band:
+            est, _ = abs_delta_range(spot, spot, strike, T, iv, iv, is_call)
+            skip |= known & ((est < delta_band[0] - DELTA_MARGIN) | (est > delta_band[1] + DELTA_MARGIN))
+        if prem_min is not None or prem_max is not None:
+            premium = native_price(spot, strike, T, iv, is_call)
+            if premium_in_btc:
+                premium = premium * spot
+            if prem_min is not None:
+                skip |= known & (premium * PREMIUM_FACTOR < prem_min)
+            if prem_max is not None:
+                skip |= known & (premium / PREMIUM_FACTOR > prem_max)
+    return skip
@@ -0,0 +1,291 @@
+"""
+LRU cache of scan results per market snapshot, and result tokens.
+
+Snapshot scans are priced as of the snapshot's fetch time (see
+BTCOptionsScanner.scan_snapshot), so they are pure functions of a snapshot
+and the filter parameters, and a result can be reused by every request with
+the same snapshot version and equivalent parameters. Keys use normalized
+parameters, so e.g. "10" and 10 for dte_max or a list and tuple delta band
+hit the same entry. Memory is bounded by both entry count and the total
+number of cached rows, and everything computed for an older snapshot is
+dropped once a newer one is seen.
+
+ResultTokens hands out opaque tokens for full (unlimited) results so a
+later request, such as a CSV export, can fetch exactly the rows a scan was
+based on for a bounded time, even after the snapshot has moved on. A token
+holds the snapshot and parameters; the full result is only computed when
+the token is first used, once however many requests use it at the same
+time.
+"""
+
+import datetime as dt
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import columnar
+from singleflight import SingleFlight
+
+
+def _number(value) -> Optional[float]:
+    return None if value is None or value == "" else float(value)
+
+
+def _flag(name: str, value) -> bool:
+    # Form and query values arrive as strings, where bool("false") would be True
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in ("", "0", "false", "no", "off"):
+            return False
+        if text in ("1", "true", "yes", "on"):
+            return True
+        raise ValueError(f"{name} must be true or false, got {value!r}")
+    return bool(value)
+
+
+# Scan parameters in key order; anything else in a params dict is left out of keys
+PARAM_KEYS = ("dte_max", "expiry", "side", "delta_band", "prem_min", "prem_max",
+              "premium_in_btc", "limit", "sort", "desc")
+
+
+def coerce_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Scan parameters converted to the types the scanner expects.
+
+    Use the result both for the scan and for cache keys, so equivalent
+    requests (e.g. "10" and 10 for dte_max) share an entry and compute the
+    same thing. Other keys are passed through unchanged. Raises ValueError
+    or TypeError for values that cannot be converted or that the scan
+    cannot use (an expiry not in YYYY-MM-DD form, a delta band without
+    exactly two bounds, an unknown sort column, a negative limit).
+    """
+    dte_max = params.get("dte_max")
+    delta_band = params.get("delta_band")
+    limit = params.get("limit")
+    side = params.get("side") or "both"
+    sort = params.get("sort") or "pop_delta"
+    coerced = dict(params)
+    coerced.update(
+        dte_max=None if dte_max in (None, "") else int(dte_max),
+        expiry=params.get("expiry") or None,
+        side=side if side in ("calls", "puts") else "both",
+        delta_band=tuple(float(v) for v in delta_band) if delta_band else None,
+        prem_min=_number(params.get("prem_min")),
+        prem_max=_number(params.get("prem_max")),
+        premium_in_btc=_flag("premium_in_btc", params.get("premium_in_btc")),
+        limit=None if limit in (None, "") else int(limit),
+        sort=sort,
+        desc=_flag("desc", params.get("desc", True)),
+    )
+    if coerced["expiry"] is not None:
+        try:
+            dt.datetime.strptime(coerced["expiry"], "%Y-%m-%d")
+        except (TypeError, ValueError):
+            raise ValueError(f"expiry must be YYYY-MM-DD, got {coerced['expiry']!r}")
+    if coerced["delta_band"] is not None and len(coerced["delta_band"]) != 2:
+        raise ValueError(f"delta_band must be [min, max], got {delta_band!r}")
+    if sort not in columnar.COLUMNS:
+        raise ValueError(f"Unknown sort column {sort!r}")
+    if coerced["limit"] is not None and coerced["limit"] < 0:
+        raise ValueError(f"limit must not be negative, got {limit!r}")
+    return coerced
+
+
+def normalize_params(params: Dict[str, Any]) -> Tuple[Hashable, ...]:
+    """Hashable, canonical form of a scan parameter dict (see coerce_params)"""
+    coerced = coerce_params(params)
+    return tuple(coerced[key] for key in PARAM_KEYS)
+
+
+class ResultCache:
+    """Thread-safe LRU of scan results keyed by (snapshot version, normalized params)"""
+
+    def __init__(self, max_entries: int = 256, max_rows: int = 500000):
+        """
+        Args:
+            max_entries: Maximum number of cached results
+            max_rows: Maximum number of result rows held across all entries
+        """
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.version = 0
+        self.rows = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version: int, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The cached result for these parameters on this snapshot version, or None"""
+        key = (version, normalize_params(params))
+        with self._lock:
+            self._advance(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, version: int, params: Dict[str, Any], result: Dict[str, Any]):
+        """Cache a result; results for snapshots older than the newest seen are ignored"""
+        key = (version, normalize_params(params))
+        size = len(result.get("data", ()))
+        with self._lock:
+            self._advance(version)
+            if version < self.version or size > self.max_rows:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.rows -= old[1]
+            self._entries[key] = (result, size)
+            self.rows += size
+            while len(self._entries) > self.max_entries or self.rows > self.max_rows:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.rows -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.rows = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Current size and hit/miss counters"""
+        with self._lock:
+            return {"entries": len(self._entries), "rows": self.rows, "hits": self.hits,
+                    "misses": self.misses, "version": self.version}
+
+    def _advance(self, version: int):
+        # A newer snapshot makes every cached result obsolete
+        if version > self.version:
+            self.version = version
+            self._entries.clear()
+            self.rows = 0
+
+
+class _Held:
+    __slots__ = ("snapshot", "params", "expires_at", "result", "rows")
+
+    def __init__(self, snapshot, params: Dict[str, Any], expires_at: float):
+        self.snapshot = snapshot
+        self.params = params
+        self.expires_at = expires_at
+        self.result: Optional[Dict[str, Any]] = None
+        self.rows = 0
+
+
+class ResultTokens:
+    """
+    Time-limited, size-bounded store of full scan results addressed by opaque tokens.
+
+    A token pins a snapshot and parameter set; the full result is only
+    computed when a token is first resolved (e.g. by an export), and then
+    kept for later requests on the same token.
+    """
+
+    def __init__(self, ttl: float = 600, max_entries: int = 256, max_rows: int = 1000000):
+        """
+        Args:
+            ttl: Seconds a result stays retrievable after it was last issued
+            max_entries: Maximum number of tokens held
+            max_rows: Maximum number of computed result rows held across all tokens
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.rows = 0
+        # token -> held snapshot/params/result; one token per (version, params, slot) key
+        self._held: "OrderedDict[str, _Held]" = OrderedDict()
+        self._tokens: Dict[Tuple, str] = {}
+        self._keys: Dict[str, Tuple] = {}
+        # slot -> the only token that slot currently holds
+        self._slots: Dict[Hashable, str] = {}
+        self._lock = threading.Lock()
+        # First resolves of a token share one computation
+        self._flight = SingleFlight()
+
+    def issue(self, snapshot, params: Dict[str, Any], slot: Optional[Hashable] = None) -> str:
+        """
+        Token for the full result of params on snapshot; reissuing the same key extends its lifetime.
+
+        With a slot (e.g. a live feed id), the slot holds at most one token:
+        issuing a new one drops the slot's previous token, so frequent
+        reissuers cannot crowd out everyone else's.
+        """
+        key = (snapshot.version, normalize_params(params), slot)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            token = self._tokens.get(key)
+            if token is None:
+                token = secrets.token_urlsafe(16)
+                self._tokens[key] = token
+                self._keys[token] = key
+                self._held[token] = _Held(snapshot, dict(params), now + self.ttl)
+            else:
+                self._held.move_to_end(token)
+                self._held[token].expires_at = now + self.ttl
+            if slot is not None:
+                previous = self._slots.get(slot)
+                self._slots[slot] = token
+                if previous is not None and previous != token and previous in self._held:
+                    self._drop(previous)
+            self._evict(keep=token)
+            return token
+
+    def resolve(self, token: str, compute: Callable[[Any, Dict[str, Any]], Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        The full result for a token, computed as compute(snapshot, params) on first use; None if expired.
+
+        Concurrent first resolves of the same token (e.g. every browser
+        watching a live feed redrawing its table) wait for a single
+        computation instead of each running the full scan.
+        """
+        with self._lock:
+            self._expire(time.time())
+            held = self._held.get(token)
+            if held is None:
+                return None
+            if held.result is not None:
+                return held.result
+        result, _ = self._flight.do(token, lambda: self._fill(token, held, compute))
+        return result
+
+    def _fill(self, token: str, held: _Held, compute: Callable[[Any, Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        # A flight that finished after our check may have filled it already
+        if held.result is not None:
+            return held.result
+        # Computed outside the lock, so other tokens are not held up
+        result = compute(held.snapshot, held.params)
+        with self._lock:
+            if self._held.get(token) is held and held.result is None:
+                held.result = result
+                held.rows = len(result.get("data", ()))
+                self.rows += held.rows
+                self._evict(keep=token)
+        return result
+
+    def _evict(self, keep: str):
+        while len(self._held) > 1 and (len(self._held) > self.max_entries or self.rows > self.max_rows):
+            # Never drop the token being issued or resolved
+            self._drop(next(token for token in self._held if token != keep))
+
+    def _drop(self, token: str):
+        held = self._held.pop(token)
+        self.rows -= held.rows
+        key = self._keys.pop(token)
+        self._tokens.pop(key, None)
+        slot = key[2]
+        if slot is not None and self._slots.get(slot) == token:
+            del self._slots[slot]
+
+    def _expire(self, now: float):
+        # Entries are ordered by issue time, so expired ones are at the front
+        while self._held:
+            token, held = next(iter(self._held.items()))
+            if held.expires_at > now:
+                break
+            self._drop(token)
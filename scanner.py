@@ -1,80 +1,313 @@
 import datetime as dt
+import logging
 import math
 import sys
-from typing import Dict, Any, List, Tuple, Optional
-import requests
-import pandas as pd
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from typing import Dict, Any, Iterator, List, Tuple, Optional
+import numpy as np
 
-DERIBIT = "https://www.deribit.com/api/v2"
+import columnar
+import deribit
+import fetch_priority
+import pricing
+import pruning
+from freshness import Freshness, SWRCache
+from instruments import InstrumentCache, InstrumentRegistry
+
+
+def fetch_instruments(stats: Optional[deribit.CallStats] = None) -> List[Dict[str, Any]]:
+    """Download all live BTC option instruments from Deribit"""
+    return deribit.public_get("public/get_instruments",
+                              {"currency": "BTC", "kind": "option", "expired": "false"},
+                              timeout=30, stats=stats)
+
+
+# Shared by every scanner instance in the process
+instrument_cache = InstrumentCache(fetch_instruments)
+# Tickers and bulk book summaries for live scans, served within each request's freshness budget.
+# Snapshot builds (fetch_market) always fetch, so snapshot ages stay truthful
+quote_cache = SWRCache()
+# Last delta / premium / IV seen per instrument, used to order fetches by relevance
+quote_history = fetch_priority.QuoteHistory()
 
 class BTCOptionsScanner:
     """Bitcoin Options Scanner for Deribit"""
     
-    def __init__(self):
-        self.btc_spot = None
+    def __init__(self, max_workers: int = 16, ticker_timeout: float = 15, stream=None):
+        """
+        Args:
+            max_workers: Maximum number of get_ticker calls in flight at once
+            ticker_timeout: Per-call timeout in seconds for get_ticker
+            stream: Optional market_stream.ChainSubscriber; while it is live,
+                scans read spot, instruments and tickers from it instead of REST
+        """
+        self.max_workers = max_workers
+        self.ticker_timeout = ticker_timeout
+        self.stream = stream
+        # Keep one pooled connection per concurrent ticker call
+        deribit.get_session(max_workers)
     
     def phi(self, x: float) -> float:
         """Standard normal cumulative distribution function"""
         return 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
     
-    def lognormal_pop_threshold(self, S0: float, sigma: float, T_years: float, threshold: float, direction: str) -> float:
-        """Calculate probability of profit using lognormal distribution"""
-        if S0 <= 0 or sigma <= 0 or T_years <= 0 or threshold <= 0:
-            return float('nan')
-        z = (math.log(threshold / S0) + 0.5 * sigma * sigma * T_years) / (sigma * math.sqrt(T_years))
-        p_le = self.phi(z)
-        return p_le if direction == 'le' else (1.0 - p_le)
-    
-    def parse_instrument(self, instr: str) -> Tuple[Optional[dt.date], Optional[float], Optional[str]]:
-        """Parse Deribit instrument name"""
-        try:
-            parts = instr.split("-")
-            d = parts[1]
-            strike = float(parts[2])
-            opt_type = parts[3].upper()
-            expiry = dt.datetime.strptime(d, "%d%b%y").date()
-            return expiry, strike, opt_type
-        except Exception:
-            return None, None, None
-    
-    def get_btc_spot(self) -> float:
-        """Get current BTC spot price from Deribit"""
-        r = requests.get(f"{DERIBIT}/public/ticker", params={"instrument_name": "BTC-PERPETUAL"}, timeout=15)
-        r.raise_for_status()
-        data = r.json().get("result", {})
+    def get_btc_spot(self, stats: Optional[deribit.CallStats] = None, deadline: Optional[float] = None) -> float:
+        """Get current BTC spot price from Deribit, giving up at deadline (epoch seconds) if given"""
+        data = deribit.public_get("public/ticker", {"instrument_name": "BTC-PERPETUAL"}, timeout=15,
+                                  stats=stats, deadline=deadline) or {}
         for key in ("index_price", "mark_price", "last_price"):
             if key in data and data[key]:
                 return float(data[key])
         return float(data.get("last_price", "nan"))
     
-    def get_instruments(self) -> List[Dict[str, Any]]:
-        """Get all BTC options instruments from Deribit"""
-        r = requests.get(f"{DERIBIT}/public/get_instruments",
-                         params={"currency": "BTC", "kind": "option", "expired": "false"},
-                         timeout=30)
-        r.raise_for_status()
-        return r.json()["result"]
-    
-    def get_ticker(self, instr: str) -> Dict[str, Any]:
-        """Get ticker data for a specific instrument"""
-        r = requests.get(f"{DERIBIT}/public/ticker", params={"instrument_name": instr}, timeout=15)
-        r.raise_for_status()
-        return r.json()["result"]
-    
-    def estimate_mid(self, result: Dict[str, Any]) -> float:
-        """Estimate mid price from ticker data"""
-        bid = result.get("best_bid")
-        ask = result.get("best_ask")
-        mark = result.get("mark_price")
-        if bid is not None and ask is not None and bid > 0 and ask > 0:
-            return 0.5 * (bid + ask)
-        if mark is not None and mark > 0:
-            return float(mark)
-        last = result.get("last_price")
-        return float(last) if last is not None else float("nan")
+    def get_instruments(self, stats: Optional[deribit.CallStats] = None) -> List[Dict[str, Any]]:
+        """Get all BTC options instruments from the shared instrument cache"""
+        return instrument_cache.get(stats)
+    
+    def get_registry(self, stats: Optional[deribit.CallStats] = None,
+                     deadline: Optional[float] = None) -> InstrumentRegistry:
+        """
+        Get the instrument registry for the cached instrument list.
+        
+        With a deadline, a stale cached list is served while it is refreshed
+        in the background, so a TTL expiry or rollover never holds the scan
+        up; only an empty cache is fetched inline.
+        """
+        return instrument_cache.get_registry(stats, wait=deadline is None)
+    
+    def get_book_summaries(self, stats: Optional[deribit.CallStats] = None,
+                           freshness: Optional[Freshness] = None,
+                           deadline: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Get book summaries for all BTC options in one call, keyed by instrument name.
+        
+        With a freshness budget, a cached result within the budget is served
+        instead (see freshness.SWRCache); without one, it is always fetched.
+        A fetch gives up at deadline (epoch seconds), retries included.
+        """
+        def fetch(stats=None, deadline=None):
+            summaries = deribit.public_get("public/get_book_summary_by_currency",
+                                           {"currency": "BTC", "kind": "option"},
+                                           timeout=30, stats=stats, deadline=deadline)
+            return {s["instrument_name"]: s for s in summaries if s.get("instrument_name")}
+        
+        if freshness is None:
+            return fetch(stats, deadline)
+        # Background refreshes outlive this scan, so they run without its deadline and stats
+        return quote_cache.get(("book_summary", "BTC"), lambda: fetch(stats, deadline), freshness, refresh=fetch)
+    
+    def get_ticker(self, instr: str, timeout: float = 15, stats: Optional[deribit.CallStats] = None,
+                   freshness: Optional[Freshness] = None, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Get ticker data for a specific instrument, from the cache when within the freshness budget"""
+        def fetch(stats=None, deadline=None):
+            return deribit.public_get("public/ticker", {"instrument_name": instr}, timeout=timeout, stats=stats,
+                                      deadline=deadline)
+        
+        if freshness is None:
+            return fetch(stats, deadline)
+        # Background refreshes outlive this scan, so they run without its deadline and stats
+        return quote_cache.get(("ticker", instr), lambda: fetch(stats, deadline), freshness, refresh=fetch)
+    
+    def fetch_tickers(self, names: List[str], stats: Optional[deribit.CallStats] = None,
+                      freshness: Optional[Freshness] = None, deadline: Optional[float] = None,
+                      unresolved: Optional[Dict[str, List[str]]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch tickers for several instruments on a bounded worker pool.
+        
+        Instruments whose call fails or does not finish in time are left out
+        of the returned mapping and counted as dropped in stats. With a
+        deadline (epoch seconds), waiting stops there; the names of calls
+        still in flight and of calls never started are then appended to
+        unresolved['pending'] and unresolved['skipped'].
+        """
+        return dict(self.iter_tickers(names, stats, freshness, deadline, unresolved))
+    
+    def iter_tickers(self, names: List[str], stats: Optional[deribit.CallStats] = None,
+                     freshness: Optional[Freshness] = None, deadline: Optional[float] = None,
+                     unresolved: Optional[Dict[str, List[str]]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Like fetch_tickers(), but yield (name, ticker) pairs as each call completes"""
+        if not names:
+            return
+        
+        def fetch(name: str) -> Dict[str, Any]:
+            # A call never waits on Deribit past the deadline, retries included
+            return self.get_ticker(name, self.ticker_timeout, stats, freshness, deadline)
+        
+        got = 0
+        pool = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(names))))
+        try:
+            futures = {pool.submit(fetch, name): name for name in names}
+            # Calls run in waves of max_workers, so budget one timeout per wave
+            waves = -(-len(names) // max(1, self.max_workers))
+            timeout = self.ticker_timeout * waves + 1
+            if deadline is not None:
+                timeout = min(timeout, max(0.0, deadline - time.time()))
+            try:
+                for fut in as_completed(futures, timeout=timeout):
+                    if fut.exception() is None:
+                        got += 1
+                        quote_history.record(futures[fut], fut.result())
+                        yield futures[fut], fut.result()
+            except FuturesTimeout:
+                if unresolved is not None:
+                    for fut, name in futures.items():
+                        if not fut.done():
+                            # Queued calls can still be cancelled; running ones are pending
+                            unresolved["skipped" if fut.cancel() else "pending"].append(name)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            if stats is not None:
+                stats.add(dropped=len(names) - got)
+    
+    def bs_delta(self, S0: float, strike: float, sigma: float, T_years: float, opt_type: str) -> Optional[float]:
+        """Black-Scholes delta with zero rates"""
+        if not S0 or S0 <= 0 or strike <= 0 or sigma <= 0 or T_years <= 0:
+            return None
+        d1 = (math.log(S0 / strike) + 0.5 * sigma * sigma * T_years) / (sigma * math.sqrt(T_years))
+        return self.phi(d1) if opt_type == "C" else self.phi(d1) - 1.0
+    
+    def ticker_from_summary(self, summary: Dict[str, Any], strike: float, opt_type: str,
+                            T_years: float) -> Optional[Dict[str, Any]]:
+        """
+        Map a book summary onto the ticker fields used by scan().
+        
+        The summary carries no greeks, so delta is derived from mark IV and the
+        underlying price. Returns None when that is not possible, in which case
+        the caller should fall back to get_ticker().
+        """
+        mark_iv = summary.get("mark_iv")
+        underlying = summary.get("underlying_price")
+        if not mark_iv or not underlying:
+            return None
+        # Deribit quotes mark_iv in percent
+        delta = self.bs_delta(float(underlying), strike, float(mark_iv) / 100.0, T_years, opt_type)
+        if delta is None:
+            return None
+        return {
+            "best_bid": summary.get("bid_price"),
+            "best_ask": summary.get("ask_price"),
+            "mark_price": summary.get("mark_price"),
+            "last_price": summary.get("last"),
+            "mark_iv": mark_iv,
+            "underlying_price": underlying,
+            "greeks": {"delta": delta},
+        }
+    
+    def load_market(self, stats: deribit.CallStats, stream=None,
+                    deadline: Optional[float] = None) -> Tuple[float, InstrumentRegistry]:
+        """Get spot and the instrument registry, from the live stream when given"""
+        # Get BTC spot price
+        try:
+            spot = stream.get_spot() if stream else None
+            spot = spot if spot else self.get_btc_spot(stats, deadline)
+        except Exception as e:
+            raise Exception(f"Error fetching BTC spot price: {str(e)}")
+        
+        # Get instruments
+        try:
+            registry = stream.registry if stream else self.get_registry(stats, deadline)
+        except Exception as e:
+            raise Exception(f"Error fetching instruments: {str(e)}")
+        return spot, registry
+    
+    def resolve_tickers(self, registry: InstrumentRegistry, rows: np.ndarray, stats: deribit.CallStats,
+                        stream=None, freshness: Optional[Freshness] = None, deadline: Optional[float] = None,
+                        unresolved: Optional[Dict[str, List[str]]] = None,
+                        prune=None) -> Dict[str, Dict[str, Any]]:
+        """
+        Tickers for the given registry rows: live stream, then bulk summary, then get_ticker.
+        
+        prune, if given, is called with the rows still needing a get_ticker
+        call and returns a mask of those to skip (see prune_rows()).
+        """
+        tickers = self.bulk_tickers(registry, rows, stats, stream, freshness, deadline)
+        
+        # Fetch the remaining tickers concurrently
+        missing = self.missing_rows(registry, rows, tickers, stats, prune)
+        tickers.update(self.fetch_tickers([registry.names[i] for i in missing], stats, freshness,
+                                          deadline, unresolved))
+        return tickers
+    
+    def missing_rows(self, registry: InstrumentRegistry, rows: np.ndarray, tickers: Dict[str, Dict[str, Any]],
+                     stats: deribit.CallStats, prune=None) -> np.ndarray:
+        """rows without a ticker yet, in order, less those prune says to skip"""
+        missing = np.array([i for i in rows if registry.names[i] not in tickers], dtype=np.int64)
+        if prune is not None and len(missing):
+            skip = prune(missing)
+            stats.add(pruned=int(skip.sum()))
+            missing = missing[~skip]
+        return missing
+    
+    def prune_rows(self, registry: InstrumentRegistry, spot: float, mode: Optional[str], delta_band=None,
+                   prem_min=None, prem_max=None, premium_in_btc=False):
+        """A prune callback for resolve_tickers() in the given pruning mode, or None when off"""
+        if not mode or mode == 'off' or not (delta_band or prem_min is not None or prem_max is not None):
+            return None
+        if mode not in pruning.MODES:
+            raise Exception(f"Invalid prune mode '{mode}', expected off, strict or likely")
+        return lambda rows: pruning.prune_mask(registry, rows, spot, mode, quote_history, delta_band,
+                                               prem_min, prem_max, premium_in_btc)
+    
+    def bulk_tickers(self, registry: InstrumentRegistry, rows: np.ndarray, stats: deribit.CallStats,
+                     stream=None, freshness: Optional[Freshness] = None,
+                     deadline: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Tickers available without per-instrument calls: live stream, then bulk summary"""
+        tickers = {}
+        if stream:
+            for i in rows:
+                ticker = stream.get_ticker(registry.names[i])
+                if ticker is not None:
+                    tickers[registry.names[i]] = ticker
+        if len(tickers) < len(rows):
+            try:
+                summaries = self.get_book_summaries(stats, freshness, deadline)
+            except Exception as e:
+                # Every instrument now needs its own get_ticker call, so make that visible
+                logging.warning(f"Bulk book summary failed, falling back to per-instrument tickers: {str(e)}")
+                stats.add(bulk_failed=1)
+                summaries = {}
+            T_all = registry.years_to_expiry()
+            for i in rows:
+                name = registry.names[i]
+                summary = summaries.get(name)
+                if name in tickers or summary is None:
+                    continue
+                opt_type = "C" if registry.is_call[i] else "P"
+                ticker = self.ticker_from_summary(summary, float(registry.strike[i]), opt_type, float(T_all[i]))
+                if ticker is not None:
+                    tickers[name] = ticker
+        quote_history.record_all(tickers)
+        return tickers
+    
+    def fetch_order(self, registry: InstrumentRegistry, rows: np.ndarray, spot: float, delta_band=None,
+                    prem_min=None, prem_max=None, premium_in_btc=False) -> np.ndarray:
+        """rows in the order their tickers should be fetched: likeliest to pass the filters first"""
+        return fetch_priority.fetch_order(registry, rows, spot, quote_history, delta_band, prem_min, prem_max,
+                                          premium_in_btc)
+    
+    def fetch_market(self, stats: deribit.CallStats,
+                     deadline_ms: Optional[float] = None) -> Tuple[float, InstrumentRegistry, Dict[str, np.ndarray]]:
+        """
+        Spot, registry and quote columns for the whole chain, for building a snapshot.
+        
+        With deadline_ms, quotes not fetched in time are left out (and counted
+        as dropped) rather than holding up the snapshot.
+        """
+        deadline = None if deadline_ms is None else time.time() + deadline_ms / 1000.0
+        stream = self.live_stream()
+        spot, registry = self.load_market(stats, stream, deadline)
+        rows = self.fetch_order(registry, np.arange(len(registry)), spot)
+        tickers = self.resolve_tickers(registry, rows, stats, stream, deadline=deadline)
+        return spot, registry, columnar.ticker_columns([tickers.get(name) for name in registry.names])
+    
+    def live_stream(self):
+        """The attached stream if it is currently live, else None"""
+        return self.stream if self.stream is not None and self.stream.is_live() else None
     
     def scan(self, dte_max=None, expiry=None, side='both', delta_band=None, prem_min=None, 
-             prem_max=None, premium_in_btc=False, limit=200, sort='pop_delta', desc=True) -> Dict[str, Any]:
+             prem_max=None, premium_in_btc=False, limit=200, sort='pop_delta', desc=True,
+             max_stale=None, deadline_ms=None, prune=None) -> Dict[str, Any]:
         """
         Scan BTC options with given parameters
         
@@ -89,140 +322,195 @@ class BTCOptionsScanner:
             limit: Maximum number of results to return
             sort: Column to sort by
             desc: Sort descending if True
+            max_stale: Seconds of quote staleness to accept; cached quotes past
+                half of this are refreshed in the background. None always fetches
+            deadline_ms: Time budget for the quote fetches in milliseconds. When it
+                runs out, the scan returns the rows fetched so far with
+                'partial', 'skipped' (never started) and 'pending' (in flight)
+            prune: 'strict' or 'likely' to skip get_ticker calls for instruments
+                whose estimated delta/premium cannot pass the filters (see pruning)
             
         Returns:
             Dictionary with scan results
         """
-        today = dt.date.today()
+        now = time.time()
+        today = dt.date.fromtimestamp(now)
+        stats = deribit.CallStats()
+        freshness = None if max_stale is None else Freshness.max_stale(max_stale)
+        deadline = None if deadline_ms is None else time.time() + deadline_ms / 1000.0
+        unresolved = {'skipped': [], 'pending': []}
+        stream = self.live_stream()
+        spot, registry = self.load_market(stats, stream, deadline)
         
-        # Get BTC spot price
-        try:
-            self.btc_spot = self.get_btc_spot()
-        except Exception as e:
-            raise Exception(f"Error fetching BTC spot price: {str(e)}")
+        # Apply instrument filters through the registry indexes
+        candidates = registry.select(expiry=self.parse_expiry(expiry), dte_max=dte_max, side=side, today=today)
         
-        # Get instruments
+        # Fetch in relevance order so a deadline cuts off the least useful quotes
+        ordered = self.fetch_order(registry, candidates, spot, delta_band, prem_min, prem_max, premium_in_btc)
+        pruner = self.prune_rows(registry, spot, prune, delta_band, prem_min, prem_max, premium_in_btc)
+        tickers = self.resolve_tickers(registry, ordered, stats, stream, freshness, deadline, unresolved, pruner)
+        quotes = columnar.ticker_columns([tickers.get(registry.names[i]) for i in candidates])
+        
+        result = self.compute(spot, registry, candidates, quotes, today, delta_band, prem_min, prem_max,
+                              premium_in_btc, limit, sort, desc, now)
+        result['fetch_stats'] = stats.as_dict()
+        if deadline is not None:
+            result.update(self.deadline_report(unresolved))
+        return result
+    
+    def deadline_report(self, unresolved: Dict[str, List[str]]) -> Dict[str, Any]:
+        """Result fields describing which instruments a deadline cut off"""
+        return {
+            'partial': bool(unresolved['skipped'] or unresolved['pending']),
+            'skipped': sorted(unresolved['skipped']),
+            'pending': sorted(unresolved['pending']),
+        }
+    
+    def iter_scan(self, dte_max=None, expiry=None, side='both', delta_band=None, prem_min=None,
+                  prem_max=None, premium_in_btc=False, limit=200, sort='pop_delta', desc=True,
+                  max_stale=None, deadline_ms=None, prune=None) -> Iterator[Dict[str, Any]]:
+        """
+        Progressive scan: yield result rows as their tickers arrive, then the final view.
+        
+        Takes the same arguments as scan(). Yields frames of the form
+        {'type': 'rows', 'data': [...], 'done': n, 'total': m} with the
+        unsorted rows (passing all filters) resolved so far, first for
+        everything served by the live stream or bulk summary and then per
+        get_ticker call as it completes. The closing frame is {'type':
+        'result', ...} with the same content as scan() returns.
+        """
+        now = time.time()
+        today = dt.date.fromtimestamp(now)
+        stats = deribit.CallStats()
+        freshness = None if max_stale is None else Freshness.max_stale(max_stale)
+        deadline = None if deadline_ms is None else time.time() + deadline_ms / 1000.0
+        unresolved = {'skipped': [], 'pending': []}
+        stream = self.live_stream()
+        spot, registry = self.load_market(stats, stream, deadline)
+        candidates = registry.select(expiry=self.parse_expiry(expiry), dte_max=dte_max, side=side, today=today)
+        filters = (delta_band, prem_min, prem_max, premium_in_btc)
+        
+        def rows_frame(names: List[str], done: int) -> Dict[str, Any]:
+            rows = np.array([registry.index[name] for name in names], dtype=np.int64)
+            quotes = columnar.ticker_columns([tickers[name] for name in names])
+            partial = self.compute(spot, registry, rows, quotes, today, *filters, None, sort, desc, now)
+            return {'type': 'rows', 'data': partial['data'], 'done': done, 'total': len(candidates)}
+        
+        tickers = self.bulk_tickers(registry, candidates, stats, stream, freshness, deadline)
+        done = len(tickers)
+        yield rows_frame([registry.names[i] for i in candidates if registry.names[i] in tickers], done)
+        
+        # Rows likeliest to pass the filters arrive first
+        ordered = self.fetch_order(registry, candidates, spot, *filters)
+        pruner = self.prune_rows(registry, spot, prune, *filters)
+        missing = [registry.names[i] for i in self.missing_rows(registry, ordered, tickers, stats, pruner)]
+        for name, ticker in self.iter_tickers(missing, stats, freshness, deadline, unresolved):
+            tickers[name] = ticker
+            done += 1
+            frame = rows_frame([name], done)
+            if frame['data']:
+                yield frame
+        
+        quotes = columnar.ticker_columns([tickers.get(registry.names[i]) for i in candidates])
+        result = self.compute(spot, registry, candidates, quotes, today, *filters, limit, sort, desc, now)
+        result['fetch_stats'] = stats.as_dict()
+        if deadline is not None:
+            result.update(self.deadline_report(unresolved))
+        result['type'] = 'result'
+        yield result
+    
+    def scan_snapshot(self, snapshot, dte_max=None, expiry=None, side='both', delta_band=None, prem_min=None,
+                      prem_max=None, premium_in_btc=False, limit=200, sort='pop_delta', desc=True) -> Dict[str, Any]:
+        """
+        Scan against an immutable market.MarketSnapshot without any upstream calls.
+        
+        Takes the same filter arguments as scan(). Safe to call concurrently on
+        a shared scanner, since nothing is written to the instance. Days and
+        years to expiry are measured from the snapshot's fetch time, so the
+        result only depends on the snapshot and the filters, whenever it is
+        computed.
+        """
+        now = snapshot.fetched_at
+        today = dt.date.fromtimestamp(now)
+        registry = snapshot.registry
+        candidates = registry.select(expiry=self.parse_expiry(expiry), dte_max=dte_max, side=side, today=today)
+        quotes = {key: col[candidates] for key, col in snapshot.quotes.items()}
+        
+        result = self.compute(snapshot.spot, registry, candidates, quotes, today, delta_band, prem_min, prem_max,
+                              premium_in_btc, limit, sort, desc, now)
+        result['fetch_stats'] = snapshot.fetch_stats
+        result['snapshot_version'] = snapshot.version
+        result['fetched_at'] = snapshot.fetched_at
+        return result
+    
+    def parse_expiry(self, expiry: Optional[str]) -> Optional[dt.date]:
+        """Parse the expiry filter (YYYY-MM-DD)"""
+        if not expiry:
+            return None
         try:
-            instruments = self.get_instruments()
-        except Exception as e:
-            raise Exception(f"Error fetching instruments: {str(e)}")
+            return dt.datetime.strptime(expiry, "%Y-%m-%d").date()
+        except Exception:
+            raise Exception("Invalid expiry format, expected YYYY-MM-DD")
+    
+    def compute(self, spot: float, registry: InstrumentRegistry, candidates: np.ndarray,
+                quotes: Dict[str, np.ndarray], today: dt.date, delta_band=None, prem_min=None, prem_max=None,
+                premium_in_btc=False, limit=200, sort='pop_delta', desc=True,
+                now: Optional[float] = None) -> Dict[str, Any]:
+        """Filter, price and rank candidate rows given their quote columns, as of now (epoch seconds)"""
+        days = registry.days_to_expiry(today)
+        T_all = registry.years_to_expiry(now)
         
-        rows = []
+        premium_native = columnar.estimate_mid(quotes["best_bid"], quotes["best_ask"],
+                                               quotes["mark_price"], quotes["last_price"])
         
-        for ins in instruments:
-            name = ins.get("instrument_name")
-            if not name:
-                continue
-            expiry_date, strike, opt_type = self.parse_instrument(name)
-            if not expiry_date or strike is None:
-                continue
-            
-            # Filter by expiry
-            if expiry:
-                try:
-                    wanted = dt.datetime.strptime(expiry, "%Y-%m-%d").date()
-                    if expiry_date != wanted:
-                        continue
-                except Exception:
-                    raise Exception("Invalid expiry format, expected YYYY-MM-DD")
-            elif dte_max is not None:
-                dte = (expiry_date - today).days
-                if dte < 0 or dte > dte_max:
-                    continue
-            
-            # Filter by option type
-            if side == "calls" and opt_type != "C":
-                continue
-            if side == "puts" and opt_type != "P":
-                continue
-            
-            # Get ticker data
-            try:
-                ticker = self.get_ticker(name)
-            except Exception:
-                continue
-            
-            delta = ticker.get("greeks", {}).get("delta")
-            mark_iv = ticker.get("mark_iv")
-            premium_native = self.estimate_mid(ticker)
-            
-            # Convert premium to USD if needed
-            if premium_in_btc:
-                premium_usd = premium_native * self.btc_spot if premium_native == premium_native else float('nan')
-            else:
-                premium_usd = premium_native
-            
-            # Apply premium filters
-            if prem_min is not None and (premium_usd != premium_usd or premium_usd < prem_min):
-                continue
-            if prem_max is not None and (premium_usd != premium_usd or premium_usd > prem_max):
-                continue
-            
-            dte = max((expiry_date - today).days, 0)
-            T_years = max(dte / 365.0, 1e-6)
-            
-            # Filter by delta band
-            if delta_band:
-                dmin, dmax = delta_band
-                if delta is None:
-                    continue
-                if abs(delta) < dmin or abs(delta) > dmax:
-                    continue
-            
-            # Calculate probabilities
-            pop_delta = float('nan')
-            pop_logN = float('nan')
-            breakeven = float('nan')
-            sigma = None
-            
-            if mark_iv is not None and mark_iv > 0:
-                sigma = float(mark_iv)
-            
-            if delta is not None:
-                pop_delta = 1.0 - abs(float(delta))
-            
-            # Calculate breakeven and lognormal POP
-            if sigma and premium_usd and premium_usd > 0 and self.btc_spot and self.btc_spot > 0:
-                if opt_type == "C":
-                    breakeven = strike + premium_usd
-                    pop_logN = self.lognormal_pop_threshold(self.btc_spot, sigma, T_years, breakeven, direction="le")
-                else:
-                    breakeven = max(strike - premium_usd, 1e-6)
-                    pop_logN = self.lognormal_pop_threshold(self.btc_spot, sigma, T_years, breakeven, direction="ge")
-            
-            rows.append({
-                "instrument": name,
-                "type": "C" if opt_type == "C" else "P",
-                "expiry": expiry_date.isoformat(),
-                "dte": dte,
-                "spot": self.btc_spot,
-                "strike": strike,
-                "iv": sigma if sigma is not None else float('nan'),
-                "delta": float(delta) if delta is not None else float('nan'),
-                "premium_native": float(premium_native) if premium_native is not None else float('nan'),
-                "premium_usd": float(premium_usd) if premium_usd == premium_usd else float('nan'),
-                "breakeven": float(breakeven) if breakeven == breakeven else float('nan'),
-                "pop_delta": float(pop_delta) if pop_delta == pop_delta else float('nan'),
-                "pop_logN": float(pop_logN) if pop_logN == pop_logN else float('nan'),
-            })
-        
-        if not rows:
-            return {
-                'data': [],
-                'btc_spot': self.btc_spot,
-                'total_count': 0
-            }
-        
-        # Sort results
-        df = pd.DataFrame(rows)
-        df = df.sort_values(by=sort, ascending=not desc, na_position="last")
-        
-        # Apply limit
-        if limit:
-            df = df.head(limit)
+        # Convert premium to USD if needed
+        premium_usd = premium_native * spot if premium_in_btc else premium_native
+        
+        # Filters as boolean masks; NaN fails every comparison
+        keep = quotes["present"].copy()
+        if prem_min is not None:
+            keep &= premium_usd >= prem_min
+        if prem_max is not None:
+            keep &= premium_usd <= prem_max
+        if delta_band:
+            dmin, dmax = delta_band
+            abs_delta = np.abs(quotes["delta"])
+            keep &= (abs_delta >= dmin) & (abs_delta <= dmax)
+        
+        rows = candidates[keep]
+        delta = quotes["delta"][keep]
+        iv = np.where(quotes["mark_iv"][keep] > 0, quotes["mark_iv"][keep], np.nan)
+        premium_native = premium_native[keep]
+        premium_usd = premium_usd[keep]
+        
+        # Calculate breakeven and probabilities
+        breakeven, pop_delta, pop_logN = pricing.compute_pop(
+            spot, registry.strike[rows], iv, T_all[rows], premium_usd, registry.is_call[rows], delta)
+        
+        columns = {
+            "instrument": registry.name_array[rows],
+            "type": np.where(registry.is_call[rows], "C", "P"),
+            "expiry": registry.expiry_date[rows].astype(str),
+            "dte": np.maximum(days[rows], 0),
+            "spot": np.full(len(rows), float(spot)),
+            "strike": registry.strike[rows],
+            "iv": iv,
+            "delta": delta,
+            "premium_native": premium_native,
+            "premium_usd": premium_usd,
+            "breakeven": breakeven,
+            "pop_delta": pop_delta,
+            "pop_logN": pop_logN,
+        }
+        
+        if sort not in columns:
+            raise KeyError(sort)
+        
+        # Select and sort only the returned slice, then build its row dicts
+        order = columnar.top_k_order(columns[sort], limit, desc)
         
         return {
-            'data': df.to_dict('records'),
-            'btc_spot': self.btc_spot,
+            'data': columnar.materialize(columns, order),
+            'btc_spot': spot,
             'total_count': len(rows)
         }
@@ -2,6 +2,8 @@ class BTCOptionsScanner {
     constructor() {
         this.dataTable = null;
         this.lastScanParams = null;
+        this.lastResultToken = null;
+        this.liveSource = null;
         this.initializeEventListeners();
     }
 
@@ -22,6 +24,15 @@ class BTCOptionsScanner {
             this.clearForm();
         });
 
+        // Live updates toggle
+        document.getElementById('liveUpdates').addEventListener('change', (e) => {
+            if (e.target.checked && this.lastScanParams) {
+                this.startLive();
+            } else {
+                this.stopLive();
+            }
+        });
+
         // DTE and Expiry mutual exclusion
         document.getElementById('dteMax').addEventListener('input', () => {
             if (document.getElementById('dteMax').value) {
@@ -42,7 +53,8 @@ class BTCOptionsScanner {
             premium_in_btc: document.getElementById('premiumInBtc').checked,
             sort: document.getElementById('sortBy').value,
             desc: document.getElementById('sortDesc').checked,
-            limit: parseInt(document.getElementById('limitResults').value) || 200
+            // 0 removes the cap; the table pages through all results
+            limit: this.parseLimit(document.getElementById('limitResults').value)
         };
 
         // Optional fields
@@ -67,21 +79,32 @@ class BTCOptionsScanner {
         return formData;
     }
 
-    async performScan() {
-        try {
-            this.showLoading();
-            this.hideError();
-            this.hideResults();
+    performScan() {
+        this.hideError();
+
+        // Every page request carries the scan filters; the first one opens a
+        // result set on the server and later ones page through it by token
+        this.lastScanParams = this.collectFormData();
+        this.lastResultToken = null;
+        document.getElementById('exportBtn').disabled = true;
+        this.showLoading();
+        this.initializeTable();
 
-            const formData = this.collectFormData();
-            this.lastScanParams = formData;
+        if (document.getElementById('liveUpdates').checked) {
+            this.startLive();
+        }
+    }
 
-            const response = await fetch('/scan', {
+    async startLive() {
+        this.stopLive();
+        try {
+            // Register the scan filters; the server pushes row diffs on every market refresh
+            const response = await fetch('/scan/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify(formData)
+                body: JSON.stringify(this.lastScanParams)
             });
 
             const result = await response.json();
@@ -90,56 +113,79 @@ class BTCOptionsScanner {
                 throw new Error(result.error || 'Unknown error occurred');
             }
 
-            this.displayResults(result);
-            document.getElementById('exportBtn').disabled = false;
+            const source = new EventSource(result.stream_url);
+            source.addEventListener('reset', (e) => this.applyLiveUpdate(JSON.parse(e.data), true));
+            source.addEventListener('diff', (e) => this.applyLiveUpdate(JSON.parse(e.data), false));
+            source.onerror = () => {
+                // The feed expired on the server; register again
+                if (source.readyState === EventSource.CLOSED && this.liveSource === source) {
+                    this.startLive();
+                }
+            };
+            this.liveSource = source;
 
         } catch (error) {
-            this.showError(error.message);
-            console.error('Scan error:', error);
-        } finally {
-            this.hideLoading();
+            document.getElementById('liveUpdates').checked = false;
+            this.showError(`Live updates failed: ${error.message}`);
         }
     }
 
-    displayResults(result) {
-        const { data, btc_spot, total_count } = result;
+    stopLive() {
+        if (this.liveSource) {
+            this.liveSource.close();
+            this.liveSource = null;
+        }
+    }
 
-        // Update info
-        const resultsInfo = document.getElementById('resultsInfo');
-        resultsInfo.textContent = `BTC Spot: $${btc_spot.toFixed(2)} | Showing ${data.length} of ${total_count} options`;
+    applyLiveUpdate(update, reset) {
+        // Page through the feed's latest result from now on
+        if (update.result_token) {
+            this.lastResultToken = update.result_token;
+        }
+        if (!this.dataTable) {
+            return;
+        }
 
+        // Only redraw when the update can affect the rows on screen
+        const visible = new Set(this.dataTable.rows().data().toArray().map(row => row.instrument));
+        const affected = reset || update.order || update.inserted.length || update.removed.length ||
+            update.changed.some(row => visible.has(row.instrument));
+        if (affected) {
+            this.dataTable.draw(false);
+        }
+    }
+
+    initializeTable() {
         // Destroy existing DataTable if exists
         if (this.dataTable) {
             this.dataTable.destroy();
         }
 
         // Clear table body
-        const tbody = document.querySelector('#resultsTable tbody');
-        tbody.innerHTML = '';
-
-        // Populate table
-        data.forEach(row => {
-            const tr = document.createElement('tr');
-            tr.innerHTML = `
-                <td><code>${row.instrument}</code></td>
-                <td><span class="badge bg-${row.type === 'C' ? 'success' : 'danger'}">${row.type}</span></td>
-                <td>${row.expiry}</td>
-                <td>${row.dte}</td>
-                <td>$${this.formatNumber(row.spot, 2)}</td>
-                <td>$${this.formatNumber(row.strike, 0)}</td>
-                <td>${this.formatPercentage(row.iv)}</td>
-                <td>${this.formatNumber(row.delta, 3)}</td>
-                <td>${this.formatNumber(row.premium_native, 8)}</td>
-                <td>$${this.formatNumber(row.premium_usd, 2)}</td>
-                <td>$${this.formatNumber(row.breakeven, 2)}</td>
-                <td>${this.formatPercentage(row.pop_delta)}</td>
-                <td>${this.formatPercentage(row.pop_logN)}</td>
-            `;
-            tbody.appendChild(tr);
-        });
+        document.querySelector('#resultsTable tbody').innerHTML = '';
+        this.showResults();
 
-        // Initialize DataTable
+        // Paging, sorting and searching happen server-side
         this.dataTable = new DataTable('#resultsTable', {
+            serverSide: true,
+            processing: true,
+            searchDelay: 400,
+            ajax: (request, callback) => this.fetchPage(request, callback),
+            columns: [
+                { data: 'instrument', render: v => `<code>${v}</code>` },
+                { data: 'type', render: v => `<span class="badge bg-${v === 'C' ? 'success' : 'danger'}">${v}</span>` },
+                { data: 'expiry' },
+                { data: 'dte' },
+                { data: 'spot', render: v => `$${this.formatNumber(v, 2)}` },
+                { data: 'strike', render: v => `$${this.formatNumber(v, 0)}` },
+                { data: 'iv', render: v => this.formatPercentage(v) },
+                { data: 'delta', render: v => this.formatNumber(v, 3) },
+                { data: 'premium_native', render: v => this.formatNumber(v, 8) },
+                { data: 'premium_usd', render: v => `$${this.formatNumber(v, 2)}` },
+                { data: 'breakeven', render: v => `$${this.formatNumber(v, 2)}` },
+                { data: 'pop_delta', render: v => this.formatPercentage(v) },
+                { data: 'pop_logN', render: v => this.formatPercentage(v) }
+            ],
             pageLength: 25,
             lengthMenu: [[10, 25, 50, 100, -1], [10, 25, 50, 100, "All"]],
             order: [], // Maintain server-side ordering
@@ -157,8 +203,51 @@ class BTCOptionsScanner {
                 }
             }
         });
+    }
 
-        this.showResults();
+    async fetchPage(request, callback) {
+        try {
+            const response = await fetch('/scan/table', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    ...request,
+                    ...this.lastScanParams,
+                    result_token: this.lastResultToken
+                })
+            });
+
+            const result = await response.json();
+
+            if (!result.success) {
+                throw new Error(result.error || 'Unknown error occurred');
+            }
+
+            this.lastResultToken = result.result_token;
+            this.displayResultsInfo(result);
+            document.getElementById('exportBtn').disabled = false;
+            callback(result);
+
+        } catch (error) {
+            this.showError(error.message);
+            console.error('Scan error:', error);
+            callback({ draw: request.draw, recordsTotal: 0, recordsFiltered: 0, data: [] });
+        } finally {
+            this.hideLoading();
+        }
+    }
+
+    displayResultsInfo(result) {
+        const { btc_spot, total_count, recordsTotal, data_age } = result;
+
+        // Update info
+        const resultsInfo = document.getElementById('resultsInfo');
+        resultsInfo.textContent = `BTC Spot: $${btc_spot.toFixed(2)} | Showing ${recordsTotal} of ${total_count} options`;
+        if (data_age !== undefined && data_age !== null) {
+            resultsInfo.textContent += ` | Data age: ${data_age.toFixed(1)}s`;
+        }
     }
 
     async exportResults() {
@@ -173,11 +262,13 @@ class BTCOptionsScanner {
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify(this.lastScanParams)
+                // Export exactly the rows of the last scan
+                body: JSON.stringify({ ...this.lastScanParams, result_token: this.lastResultToken })
             });
 
             if (!response.ok) {
-                throw new Error('Export failed');
+                const result = await response.json().catch(() => ({}));
+                throw new Error(result.error || 'Export failed');
             }
 
             // Create download
@@ -196,7 +287,13 @@ class BTCOptionsScanner {
         }
     }
 
+    parseLimit(value) {
+        const limit = parseInt(value);
+        return isNaN(limit) ? 200 : Math.max(limit, 0);
+    }
+
     clearForm() {
+        this.stopLive();
         document.getElementById('scannerForm').reset();
         document.getElementById('sideBoth').checked = true;
         document.getElementById('sortDesc').checked = true;
@@ -0,0 +1,154 @@
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+import deribit
+
+
+def response(status: int = 200, result=None) -> requests.Response:
+    r = requests.Response()
+    r.status_code = status
+    r._content = json.dumps({"result": result}).encode()
+    return r
+
+
+class FakeSession:
+    """Stands in for the pooled session; reply(params, timeout) produces each response"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        with self._lock:
+            self.calls += 1
+        return self.reply(params, timeout)
+
+
+def slow(seconds: float, result="ok"):
+    """A reply taking seconds, or raising Timeout when the call's timeout is shorter"""
+    def reply(params, timeout):
+        time.sleep(min(seconds, timeout))
+        if timeout < seconds:
+            raise requests.Timeout(f"timed out after {timeout:.2f}s")
+        return response(result=result)
+    return reply
+
+
+@pytest.fixture
+def session(monkeypatch):
+    def install(reply):
+        fake = FakeSession(reply)
+        monkeypatch.setattr(deribit, "get_session", lambda *args: fake)
+        return fake
+
+    monkeypatch.setattr(deribit, "limiter", deribit.CreditLimiter())
+    return install
+
+
+def run(fn):
+    """Run fn on a thread; returns a dict filled with its result or error once joined"""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = fn()
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    outcome["thread"] = thread
+    return outcome
+
+
+def test_deadline_call_does_not_wait_behind_slow_call(session):
+    session(slow(0.6))
+    shared = run(lambda: deribit.public_get("public/ticker", {"instrument_name": "BTC-PERPETUAL"}))
+    time.sleep(0.05)
+
+    started = time.time()
+    with pytest.raises(requests.Timeout):
+        deribit.public_get("public/ticker", {"instrument_name": "BTC-PERPETUAL"}, deadline=time.time() + 0.2)
+    assert time.time() - started < 0.45
+
+    shared["thread"].join()
+    assert shared["result"] == "ok"
+
+
+def test_deadline_timeout_is_not_handed_to_other_callers(session):
+    fake = session(slow(0.3))
+    stats = deribit.CallStats()
+    bounded = run(lambda: deribit.public_get("public/get_book_summary_by_currency", {"currency": "BTC"},
+                                             deadline=time.time() + 0.1))
+    time.sleep(0.02)
+    assert deribit.public_get("public/get_book_summary_by_currency", {"currency": "BTC"}, stats=stats) == "ok"
+
+    bounded["thread"].join()
+    assert isinstance(bounded["error"], requests.Timeout)
+    assert stats.as_dict()["coalesced"] == 0
+    assert fake.calls >= 2
+
+
+def test_retries_stop_at_deadline(session):
+    fake = session(lambda params, timeout: response(503))
+    started = time.time()
+    with pytest.raises(requests.HTTPError):
+        deribit.public_get("public/ticker", {"instrument_name": "BTC-PERPETUAL"}, deadline=time.time() + 0.3)
+    assert time.time() - started < 0.35
+    assert 1 <= fake.calls <= deribit.RETRIES
+
+
+def test_attempt_timeout_is_capped_by_deadline(session):
+    seen = []
+
+    def reply(params, timeout):
+        seen.append(timeout)
+        return response(result="ok")
+
+    session(reply)
+    deribit.public_get("public/ticker", {"instrument_name": "BTC-PERPETUAL"}, timeout=15,
+                       deadline=time.time() + 1)
+    assert seen and seen[0] <= 1
+
+
+def test_concurrent_identical_calls_share_one_request(session):
+    fake = session(slow(0.2, result={"index_price": 65000.0}))
+    stats = [deribit.CallStats() for _ in range(5)]
+    calls = [run(lambda s=s: deribit.public_get("public/ticker", {"instrument_name": "BTC-PERPETUAL"}, stats=s))
+             for s in stats]
+    for call in calls:
+        call["thread"].join()
+
+    assert fake.calls == 1
+    assert all(call["result"] == {"index_price": 65000.0} for call in calls)
+    assert sum(s.as_dict()["coalesced"] for s in stats) == 4
+    assert sum(s.as_dict()["requests"] for s in stats) == 1
+
+
+def test_different_params_are_not_coalesced(session):
+    fake = session(slow(0.1))
+    calls = [run(lambda name=name: deribit.public_get("public/ticker", {"instrument_name": name}))
+             for name in ("BTC-PERPETUAL", "BTC-28MAR31-80000-C")]
+    for call in calls:
+        call["thread"].join()
+    assert fake.calls == 2
+
+
+def test_shared_failure_reaches_every_caller_and_is_forgotten(session):
+    fake = session(lambda params, timeout: time.sleep(0.1) or response(404))
+    calls = [run(lambda: deribit.public_get("public/ticker", {"instrument_name": "BTC-PERPETUAL"}))
+             for _ in range(3)]
+    for call in calls:
+        call["thread"].join()
+    assert all(isinstance(call["error"], requests.HTTPError) for call in calls)
+    assert fake.calls == 1
+
+    # Once the call is over, the next caller makes a fresh request
+    fake.reply = lambda params, timeout: response(result="ok")
+    assert deribit.public_get("public/ticker", {"instrument_name": "BTC-PERPETUAL"}) == "ok"
+    assert fake.calls == 2
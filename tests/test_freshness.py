@@ -0,0 +1,68 @@
+import threading
+import time
+
+from freshness import Freshness, SWRCache
+
+
+def wait_until(condition, timeout: float = 2.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_background_refresh_uses_refresh_not_caller_fetch():
+    cache = SWRCache()
+    cache.put("k", "old", fetched_at=time.time() - 3)
+    calls = []
+
+    value = cache.get("k", lambda: calls.append("fetch") or "caller", Freshness(soft_ttl=1, hard_ttl=10),
+                      refresh=lambda: calls.append("refresh") or "new")
+    assert value == "old"
+    assert wait_until(lambda: cache.get("k", lambda: "unused", Freshness(1, 10)) == "new")
+    assert calls == ["refresh"]
+
+
+def test_caller_bound_fetch_failure_stays_with_its_caller():
+    cache = SWRCache()
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise TimeoutError("caller's deadline")
+
+    errors = []
+
+    def bounded_caller():
+        try:
+            cache.get("k", failing, Freshness(1, 10), refresh=lambda: "unused")
+        except TimeoutError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=bounded_caller)
+    thread.start()
+    started.wait()
+    # A concurrent miss with its own fetch is not handed the other caller's failure
+    assert cache.get("k", lambda: "mine", Freshness(1, 10), refresh=lambda: "unused") == "mine"
+    thread.join()
+    assert errors
+
+
+def test_misses_without_refresh_are_coalesced():
+    cache = SWRCache()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return "v"
+
+    threads = [threading.Thread(target=cache.get, args=("k", fetch, Freshness(1, 10))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
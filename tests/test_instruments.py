@@ -0,0 +1,56 @@
+import threading
+import time
+
+from instruments import InstrumentCache
+
+CALL = {"instrument_name": "BTC-28MAR31-80000-C", "expiration_timestamp": 1932451200000,
+        "strike": 80000.0, "option_type": "call"}
+PUT = {"instrument_name": "BTC-28MAR31-60000-P", "expiration_timestamp": 1932451200000,
+       "strike": 60000.0, "option_type": "put"}
+
+
+def test_stale_list_is_served_without_waiting_and_refreshed_in_background():
+    release = threading.Event()
+    lists = [[CALL], [CALL, PUT]]
+
+    def fetch(stats):
+        instruments = lists.pop(0)
+        if len(instruments) > 1:
+            release.wait(2)
+        return instruments
+
+    cache = InstrumentCache(fetch)
+    assert cache.get_registry().names == [CALL["instrument_name"]]
+    cache.expires_at = 0.0
+
+    started = time.time()
+    assert cache.get_registry(wait=False).names == [CALL["instrument_name"]]
+    assert time.time() - started < 0.1
+
+    release.set()
+    deadline = time.time() + 2
+    while len(cache.registry) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert set(cache.registry.names) == {CALL["instrument_name"], PUT["instrument_name"]}
+
+
+def test_empty_cache_is_fetched_inline_even_without_waiting():
+    cache = InstrumentCache(lambda stats: [CALL])
+    assert cache.get_registry(wait=False).names == [CALL["instrument_name"]]
+
+
+def test_failed_refresh_backs_off():
+    calls = []
+
+    def fetch(stats):
+        calls.append(1)
+        if len(calls) > 1:
+            raise ConnectionError("down")
+        return [CALL]
+
+    cache = InstrumentCache(fetch, retry_after=60)
+    cache.get()
+    cache.expires_at = 0.0
+    for _ in range(3):
+        assert cache.get() == [CALL]
+    assert len(calls) == 2
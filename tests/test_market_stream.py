@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from market_stream import ChainSubscriber
+from tests.ws_replay import ReplayServer, load_recording
+
+CALL = "BTC-28MAR31-80000-C"
+PUT = "BTC-28MAR31-60000-P"
+JUNE_CALL = "BTC-27JUN31-90000-C"
+LISTED = "BTC-27JUN31-70000-P"
+
+
+def wait_until(condition, timeout: float = 5.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def recording():
+    return load_recording("deribit_chain.json")
+
+
+@pytest.fixture
+def server(recording):
+    server = ReplayServer(recording).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def subscriber(server):
+    subscriber = ChainSubscriber(url=server.url, reconnect_delay=0.1).start()
+    assert wait_until(lambda: subscriber.is_live() and subscriber.get_ticker(JUNE_CALL) is not None)
+    yield subscriber
+    subscriber.stop()
+
+
+def test_subscribe_loads_chain_and_tickers(server, subscriber):
+    assert server.methods()[:3] == ["public/set_heartbeat", "public/subscribe", "public/get_instruments"]
+    assert set(subscriber.registry.names) == {CALL, PUT, JUNE_CALL}
+    assert {f"ticker.{name}.100ms" for name in ("BTC-PERPETUAL", CALL, PUT, JUNE_CALL)} <= set(server.channels())
+    assert wait_until(lambda: subscriber.get_ticker(CALL) is not None and subscriber.get_ticker(PUT) is not None)
+    assert subscriber.get_spot() == 65000.0
+    assert subscriber.get_ticker(PUT)["greeks"]["delta"] == -0.3187
+
+
+def test_ticker_update_replaces_quote(server, subscriber, recording):
+    update = recording["updates"][0]
+    server.push(update)
+    assert wait_until(lambda: subscriber.get_ticker(CALL)["mark_price"] == update["params"]["data"]["mark_price"])
+
+
+def test_heartbeat_test_request_is_answered(server, subscriber, recording):
+    server.push(recording["heartbeat"])
+    assert wait_until(lambda: "public/test" in server.methods())
+    assert subscriber.is_live()
+
+
+def test_instrument_refresh_drops_expired_and_subscribes_listed(server, subscriber, recording):
+    # Any message after the refresh interval triggers a new instrument request
+    subscriber.instruments_refresh = 0
+    server.push(recording["heartbeat"])
+    assert wait_until(lambda: LISTED in subscriber.registry.index)
+    subscriber.instruments_refresh = 600
+
+    assert set(subscriber.registry.names) == {CALL, JUNE_CALL, LISTED}
+    assert subscriber.get_ticker(PUT) is None
+    assert f"ticker.{LISTED}.100ms" in server.channels()
+    assert wait_until(lambda: subscriber.get_ticker(LISTED) is not None)
+    assert subscriber.get_ticker(CALL) is not None
@@ -0,0 +1,44 @@
+import numpy as np
+
+import pruning
+from fetch_priority import QuoteHistory
+from instruments import InstrumentRegistry
+
+NOW = 1932451200.0 - 86400.0 * 30
+SPOT = 65000.0
+
+
+def instrument(name: str, days: float, strike: float, option_type: str = "call"):
+    return {"instrument_name": name, "expiration_timestamp": int((NOW + days * 86400.0) * 1000),
+            "strike": strike, "option_type": option_type}
+
+
+def strict(registry: InstrumentRegistry, history=None, delta_band=(0.2, 0.4)) -> np.ndarray:
+    return pruning.prune_mask(registry, np.arange(len(registry)), SPOT, "strict", history,
+                              delta_band=delta_band, now=NOW)
+
+
+def test_far_otm_call_is_pruned_but_not_near_expiry():
+    registry = InstrumentRegistry([instrument("BTC-FAR-400000-C", 30, 400000.0),
+                                   instrument("BTC-NEAR-400000-C", 1, 400000.0)])
+    assert strict(registry).tolist() == [True, False]
+
+
+def test_iv_above_bounds_seen_in_expiry_widens_the_ceiling():
+    # Out of reach at 300% IV over 30 days, but not at the 600% last seen in the expiry
+    registry = InstrumentRegistry([instrument("BTC-30D-400000-C", 30, 400000.0),
+                                   instrument("BTC-30D-70000-C", 30, 70000.0)])
+    assert strict(registry, delta_band=(0.3, 0.4))[0]
+
+    history = QuoteHistory()
+    history.record("BTC-30D-70000-C", {"mark_iv": 600.0})
+    ceiling = pruning.strict_iv_ceiling(registry, np.arange(len(registry)), history)
+    assert ceiling.tolist() == [6.0, 6.0]
+    assert not strict(registry, history, delta_band=(0.3, 0.4))[0]
+
+
+def test_ceiling_never_drops_below_iv_bounds():
+    registry = InstrumentRegistry([instrument("BTC-30D-70000-C", 30, 70000.0)])
+    history = QuoteHistory()
+    history.record("BTC-30D-70000-C", {"mark_iv": 40.0})
+    assert pruning.strict_iv_ceiling(registry, np.array([0]), history).tolist() == [pruning.IV_BOUNDS[1]]
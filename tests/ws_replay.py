@@ -0,0 +1,184 @@
+"""
+Local stand-in for Deribit's JSON-RPC WebSocket API, replaying recorded messages.
+
+ReplayServer speaks just enough of RFC 6455 (handshake, unfragmented text
+frames, ping and close) for websocket-client, one connection at a time.
+Requests are answered from a recording (see fixtures/deribit_chain.json):
+
+    replies        method -> list of results, returned in order; the last
+                   one is repeated for further calls
+    notifications  subscription messages, each pushed as soon as its
+                   channel is subscribed
+    updates        further subscription messages, pushed by tests with push()
+    heartbeat      the server's heartbeat test_request
+
+Unknown methods get a JSON-RPC "method not found" error.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+import threading
+from typing import Any, Dict, List, Optional
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def load_recording(name: str) -> Dict[str, Any]:
+    """A recording from the fixtures directory"""
+    with open(os.path.join(FIXTURES, name)) as f:
+        return json.load(f)
+
+
+class ReplayServer:
+    """Minimal WebSocket server answering JSON-RPC requests from a recording"""
+
+    def __init__(self, recording: Dict[str, Any]):
+        self.recording = recording
+        # Every decoded client request, in arrival order
+        self.received: List[Dict[str, Any]] = []
+        self._replies = {method: list(results) for method, results in recording.get("replies", {}).items()}
+        self._notifications = {msg["params"]["channel"]: msg for msg in recording.get("notifications", [])}
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(1)
+        self.url = f"ws://127.0.0.1:{self._sock.getsockname()[1]}"
+        self._conn: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self._serve, name="ws-replay", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        for sock in (self._sock, self._conn):
+            if sock is not None:
+                # shutdown() wakes a thread blocked in accept() or recv(); close() alone does not
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                sock.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def methods(self) -> List[str]:
+        """Methods of the requests received so far"""
+        with self._lock:
+            return [msg.get("method") for msg in self.received]
+
+    def channels(self) -> List[str]:
+        """Channels subscribed so far"""
+        with self._lock:
+            return [channel for msg in self.received if msg.get("method") == "public/subscribe"
+                    for channel in msg.get("params", {}).get("channels", [])]
+
+    def push(self, msg: Dict[str, Any]):
+        """Send a server-initiated message to the connected client"""
+        conn = self._conn
+        if conn is None:
+            raise ConnectionError("No client connected")
+        payload = json.dumps(msg).encode("utf-8")
+        if len(payload) < 126:
+            header = struct.pack("!BB", 0x81, len(payload))
+        elif len(payload) < 1 << 16:
+            header = struct.pack("!BBH", 0x81, 126, len(payload))
+        else:
+            header = struct.pack("!BBQ", 0x81, 127, len(payload))
+        with self._lock:
+            conn.sendall(header + payload)
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            self._conn = conn
+            try:
+                self._handshake(conn)
+                while True:
+                    opcode, payload = self._read_frame(conn)
+                    if opcode == 0x8:
+                        conn.sendall(struct.pack("!BB", 0x88, 0))
+                        break
+                    if opcode == 0x9:
+                        with self._lock:
+                            conn.sendall(struct.pack("!BB", 0x8A, len(payload)) + payload)
+                    elif opcode == 0x1:
+                        self._handle(json.loads(payload.decode("utf-8")))
+            except (OSError, ConnectionError, ValueError):
+                pass
+            finally:
+                self._conn = None
+                try:
+                    conn.close()
+                except OSError:
+                    pass
+
+    def _handle(self, msg: Dict[str, Any]):
+        with self._lock:
+            self.received.append(msg)
+        method = msg.get("method")
+        reply: Dict[str, Any] = {"jsonrpc": "2.0", "id": msg.get("id")}
+        if method == "public/subscribe":
+            channels = msg.get("params", {}).get("channels", [])
+            self.push(dict(reply, result=channels))
+            for channel in channels:
+                if channel in self._notifications:
+                    self.push(self._notifications[channel])
+            return
+        results = self._replies.get(method)
+        if results:
+            reply["result"] = results.pop(0) if len(results) > 1 else results[0]
+        else:
+            reply["error"] = {"code": -32601, "message": "Method not found"}
+        self.push(reply)
+
+    def _handshake(self, conn: socket.socket):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = conn.recv(4096)
+            if not chunk:
+                raise ConnectionError("Closed during handshake")
+            request += chunk
+        headers = {}
+        for line in request.decode("latin-1").split("\r\n")[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + _GUID).encode()).digest())
+        conn.sendall(b"HTTP/1.1 101 Switching Protocols\r\n"
+                     b"Upgrade: websocket\r\n"
+                     b"Connection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+
+    def _read_frame(self, conn: socket.socket):
+        first, second = self._read(conn, 2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", self._read(conn, 2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", self._read(conn, 8))[0]
+        # Client frames are always masked
+        mask = self._read(conn, 4) if second & 0x80 else b"\0\0\0\0"
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self._read(conn, length)))
+        return first & 0x0F, payload
+
+    @staticmethod
+    def _read(conn: socket.socket, n: int) -> bytes:
+        data = b""
+        while len(data) < n:
+            chunk = conn.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("Connection closed")
+            data += chunk
+        return data